@@ -1,87 +1,93 @@
 # main.py
 
 from src.data_fetching import fetch_multiple_indicators, EUROPE_ASIA_COUNTRIES, INDICATORS_DICT
-from src.preprocessing import load_and_clean_indicator, get_common_year, aggregate_historical
-from src.scoring import compute_relocation_score
+from src.wdi_bulk import download_wdi_bulk, import_wdi_bulk, WDI_ARCHIVE_PATH
+from src.hdi_import import import_hdi
+from src.preprocessing import load_panel
+from src.scoring import score_profiles_file, criterion_cube, rank_trajectories
+from src.pipeline import run_pipeline, publish_build
+from src.sensitivity import weight_sensitivity
+from src.predictive import forecast_linear_batch, forecast_intervals_batch
+from src.model_store import pretrain_forecasts, stored_forecasts
+from src.similarity import load_similarity_index, save_similarity_index, update_similarity_index, similar_countries
+from src import instrumentation
 
 import pandas as pd
 import os
-from functools import reduce
+import argparse
+
+INDICATORS = list(INDICATORS_DICT.values())
+RAW_PATH = "data/raw/"
+
+# Contextual data (non-numeric indicators)
+CONTEXT_DATA = {
+    "country": [
+        "Germany", "Spain", "Norway", "United Kingdom",
+        "Sweden", "Japan", "Portugal", "Greece"
+    ],
+    "maternity_score": [4, 4, 5, 3, 5, 2, 4, 3]
+}
+
+# Default weight configuration
+DEFAULT_WEIGHTS = {
+    "gdp": 0.30,
+    "gini": 0.20,
+    "education": 0.15,
+    "maternity": 0.10,
+    "employment": 0.05,
+    "stability": 0.05,
+    "hdi": 0.15
+}
 
 # -----------------------------
 # 1. Download World Bank data
 # -----------------------------
-def download_data():
+def download_data(incremental=True):
     print("📥 Starting World Bank data download...")
+    # Incremental: only missing / newly published years are requested (see data/raw/fetch_cache.json)
     fetch_multiple_indicators(
         countries=EUROPE_ASIA_COUNTRIES,
         indicators=INDICATORS_DICT,
         start_year=2003,
-        end_year=2023
+        end_year=2023,
+        incremental=incremental
     )
     print("✅ World Bank data download complete!")
 
+def import_bulk(archive_path=WDI_ARCHIVE_PATH, download=False):
+    # Full refresh from the WDI bulk archive instead of the per-indicator API crawl
+    if download:
+        print("📥 Downloading the WDI bulk archive...")
+        download_wdi_bulk(path=archive_path)
+    print(f"📦 Importing indicators from {archive_path}...")
+    import_wdi_bulk(
+        archive_path,
+        indicators=INDICATORS_DICT,
+        countries=EUROPE_ASIA_COUNTRIES,
+        start_year=2003,
+        end_year=2023
+    )
+    print("✅ WDI bulk import complete!")
+
+def refresh_hdi(source=None):
+    # UNDP CSV (downloaded when no source is given) or a saved chart payload, merged into the HDI file
+    print(f"📥 Importing HDI data from {source or 'the UNDP composite indices'}...")
+    stats = import_hdi(source)
+    print(f"✅ HDI import complete: {stats['added']} rows added, {stats['updated']} updated")
+
 # -----------------------------
 # 2. Process and score countries
 # -----------------------------
-def build_ranking():
+def run_stages(weights=DEFAULT_WEIGHTS, n_jobs=None):
+    """
+    Cached clean → panel → HDI → aggregate → normalize → score stages (see src/pipeline.py).
+    """
+    return run_pipeline(INDICATORS, pd.DataFrame(CONTEXT_DATA), weights, raw_path=RAW_PATH, n_jobs=n_jobs)
+
+def build_ranking(n_jobs=None):
     print("🔧 Building relocation score ranking...")
 
-    INDICATORS = list(INDICATORS_DICT.values())
-    RAW_PATH = "data/raw/"
-    dfs = []
-
-    for ind in INDICATORS:
-        path = os.path.join(RAW_PATH, f"{ind}_worldbank.csv")
-        df = load_and_clean_indicator(path, ind)
-        dfs.append(df)
-
-    # Option: use a shared year (only if needed)
-    # common_year = get_common_year(dfs)
-    # if not common_year:
-    #     raise Exception("❌ No common year found across all indicators.")
-    # print(f"✅ Selected common year: {common_year}")
-    # filtered = [df[df["date"] == common_year] for df in dfs]
-    # merged = reduce(lambda l, r: pd.merge(l, r, on=["country", "country_code", "date"], how="inner"), filtered)
-
-    merged = aggregate_historical(dfs)
-
-    # Load HDI external data and merge
-    hdi_path = os.path.join("data", "external", "hdi_historical.csv")
-    hdi_df = pd.read_csv(hdi_path)
-    hdi_df = hdi_df.rename(columns={
-        "Entity": "country",
-        "Year": "date",
-        "Human Development Index": "hdi"
-    })
-    hdi_df["date"] = hdi_df["date"].astype(int) 
-    hdi_df = hdi_df.rename(columns={"date": "date", "hdi": "hdi", "country": "country"})
-
-    merged = aggregate_historical(dfs)
-    merged = pd.merge(merged, hdi_df, on=["country", "date"], how="left")
-
-    # Contextual data (non-numeric indicators)
-    context_data = {
-        "country": [
-            "Germany", "Spain", "Norway", "United Kingdom",
-            "Sweden", "Japan", "Portugal", "Greece"
-        ],
-        "maternity_score": [4, 4, 5, 3, 5, 2, 4, 3]
-    }
-    context_df = pd.DataFrame(context_data)
-
-    # Default weight configuration
-    weights = {
-        "gdp": 0.30,
-        "gini": 0.20,
-        "education": 0.15,
-        "maternity": 0.10,
-        "employment": 0.05,
-        "stability": 0.05,
-        "hdi": 0.15
-    }
-
-    scored_df = compute_relocation_score(merged, context_df, weights)
+    scored_df = run_stages(n_jobs=n_jobs)["scored"]
 
     os.makedirs("data/processed", exist_ok=True)
     scored_df[["country", "relocation_score"]].sort_values(by="relocation_score", ascending=False)\
@@ -89,9 +95,177 @@ def build_ranking():
 
     print("✅ Final ranking saved to data/processed/relocation_ranking.csv")
 
+def build_forecasts(years_ahead=30, output_path="data/processed/linear_forecasts.csv", n_jobs=None):
+    print("📈 Precomputing linear-trend forecasts and bootstrap intervals for every country × indicator...")
+
+    panel = load_panel(indicators=INDICATORS)
+    forecasts = forecast_linear_batch(panel, INDICATORS, years_ahead=years_ahead)
+    intervals = forecast_intervals_batch(panel, INDICATORS, years_ahead=years_ahead, n_jobs=n_jobs)
+    forecasts.merge(intervals, on=["country", "indicator", "year"], how="left").to_csv(output_path, index=False)
+
+    print(f"✅ Forecasts saved to {output_path}")
+
+def pretrain_models(n_jobs=None):
+    print("🌲 Pre-training Random Forest forecasts for every country × indicator...")
+
+    panel = load_panel(indicators=INDICATORS)
+    n_trained = pretrain_forecasts(panel, INDICATORS, n_jobs=n_jobs)
+
+    print(f"✅ {n_trained} new series trained (others were already cached)")
+
+def yearly_cube(result):
+    # Country × year × criterion values, HDI joined per year
+    yearly = result["panel"].merge(result["hdi"], on=["country_code", "date"], how="left")
+    return criterion_cube(yearly, pd.DataFrame(CONTEXT_DATA))
+
+def publish_app_data():
+    print("📦 Publishing the app build...")
+
+    result = run_stages()
+    panel = load_panel(indicators=INDICATORS)
+    version = publish_build(result, panel, INDICATORS, stored_forecasts(panel, INDICATORS), cube=yearly_cube(result),
+                            similarity=refresh_similarity_index(result["matrix"]))
+
+    print(f"✅ Build {version} is live (data/processed/builds/CURRENT)")
+
+# -----------------------------
+# 3. Batch scoring of many weight profiles
+# -----------------------------
+def batch_score(profiles_path, output_path, top_k=3, chunk_size=10000):
+    print(f"🧮 Scoring weight profiles from {profiles_path}...")
+
+    n_profiles = score_profiles_file(
+        run_stages()["matrix"], profiles_path, output_path,
+        top_k=top_k, chunk_size=chunk_size
+    )
+
+    print(f"✅ Top-{top_k} rankings for {n_profiles} profiles saved to {output_path}")
+
+# -----------------------------
+# 4. Rank stability under perturbed weights
+# -----------------------------
+def rank_stability(n_samples=100_000, concentration=50.0, top_k=3, n_jobs=1,
+                   output_path="data/processed/rank_stability.csv"):
+    print(f"🎲 Sampling {n_samples} weight vectors around the default profile...")
+
+    summary = weight_sensitivity(
+        run_stages()["matrix"], DEFAULT_WEIGHTS, n_samples=n_samples,
+        concentration=concentration, top_k=top_k, n_jobs=n_jobs
+    )
+    summary.to_csv(output_path)
+
+    print(f"✅ Rank distribution saved to {output_path}")
+
+# -----------------------------
+# 5. Ranking trajectories over time
+# -----------------------------
+def build_trajectories(window=1, output_path="data/processed/rank_trajectories.csv"):
+    print(f"📅 Scoring every year ({window}-year window)...")
+
+    cube, countries, years = yearly_cube(run_stages())
+    rank_trajectories(cube, countries, years, DEFAULT_WEIGHTS, window=window).to_csv(output_path, index=False)
+
+    print(f"✅ Rank trajectories saved to {output_path}")
+
+# -----------------------------
+# 6. "Countries like X" similarity index
+# -----------------------------
+def refresh_similarity_index(matrix=None):
+    # Only countries whose criterion vector changed get new distances
+    index = update_similarity_index(load_similarity_index(), run_stages()["matrix"] if matrix is None else matrix)
+    save_similarity_index(index)
+    return index
+
+def find_similar(country, k=5, better=None, weighted=False):
+    index = load_similarity_index() or refresh_similarity_index()
+    neighbours = similar_countries(index, country, k=k, better=better,
+                                   weights=DEFAULT_WEIGHTS if weighted else None)
+    print(f"🔎 Countries most similar to {country}:")
+    print(neighbours.round(3).to_string())
+
 # -----------------------------
 # Run full data pipeline
 # -----------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Relocation data pipeline")
+    parser.add_argument("--profile", nargs="?", const=instrumentation.DEFAULT_OUTPUT, default=None,
+                        help="Record per-stage wall time as JSON lines "
+                             f"(default file: {instrumentation.DEFAULT_OUTPUT})")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="With --profile, also trace peak memory (slows stages; timings are flagged as traced)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("run", help="Download data and build the ranking (default)")
+
+    batch = subparsers.add_parser("batch-score", help="Score a JSONL file of weight profiles")
+    batch.add_argument("profiles", help="JSONL file, one {\"id\": ..., <criterion>: weight} per line")
+    batch.add_argument("--output", default="data/processed/profile_rankings.csv")
+    batch.add_argument("--top-k", type=int, default=3)
+    batch.add_argument("--chunk-size", type=int, default=10000)
+
+    pretrain = subparsers.add_parser("pretrain", help="Fit and cache Random Forest forecasts for all series")
+    pretrain.add_argument("--jobs", type=int, default=None)
+
+    bulk = subparsers.add_parser("import-wdi", help="Refresh raw data from the WDI bulk archive, then build the ranking")
+    bulk.add_argument("archive", nargs="?", default=WDI_ARCHIVE_PATH)
+    bulk.add_argument("--download", action="store_true", help="Download the archive first")
+
+    hdi = subparsers.add_parser("import-hdi", help="Merge UNDP HDI data into the HDI file, then rebuild the ranking")
+    hdi.add_argument("source", nargs="?", default=None,
+                     help="Saved UNDP composite-indices CSV or chart payload (.json); downloaded when omitted")
+
+    subparsers.add_parser("publish", help="Publish the app's read-only build from cached stages")
+
+    stability = subparsers.add_parser("sensitivity", help="Rank distribution under perturbed default weights")
+    stability.add_argument("--samples", type=int, default=100_000)
+    stability.add_argument("--concentration", type=float, default=50.0)
+    stability.add_argument("--top-k", type=int, default=3)
+    stability.add_argument("--jobs", type=int, default=1)
+    stability.add_argument("--output", default="data/processed/rank_stability.csv")
+
+    similar = subparsers.add_parser("similar", help="Nearest countries to a given one in criterion space")
+    similar.add_argument("country")
+    similar.add_argument("--k", type=int, default=5)
+    similar.add_argument("--better", action="append", choices=list(DEFAULT_WEIGHTS),
+                         help="Criterion a neighbour must beat the country on (repeatable)")
+    similar.add_argument("--weighted", action="store_true", help="Weight distances by the default profile")
+
+    trajectories = subparsers.add_parser("trajectories", help="Per-year scores and ranks for the default weights")
+    trajectories.add_argument("--window", type=int, default=1, help="Trailing years averaged before scoring")
+    trajectories.add_argument("--output", default="data/processed/rank_trajectories.csv")
+
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    download_data()
-    build_ranking()
\ No newline at end of file
+    args = parse_args()
+    if args.profile:
+        instrumentation.enable(args.profile, trace_memory=args.profile_memory)
+
+    if args.command == "batch-score":
+        batch_score(args.profiles, args.output, top_k=args.top_k, chunk_size=args.chunk_size)
+    elif args.command == "pretrain":
+        pretrain_models(n_jobs=args.jobs)
+    elif args.command == "import-wdi":
+        import_bulk(args.archive, download=args.download)
+        build_ranking()
+        build_forecasts()
+        pretrain_models()
+        publish_app_data()
+    elif args.command == "import-hdi":
+        refresh_hdi(args.source)
+        build_ranking()
+        publish_app_data()
+    elif args.command == "publish":
+        publish_app_data()
+    elif args.command == "similar":
+        find_similar(args.country, args.k, args.better, args.weighted)
+    elif args.command == "trajectories":
+        build_trajectories(args.window, args.output)
+    elif args.command == "sensitivity":
+        rank_stability(args.samples, args.concentration, args.top_k, args.jobs, args.output)
+    else:
+        download_data()
+        build_ranking()
+        build_forecasts()
+        pretrain_models()
+        publish_app_data()
\ No newline at end of file
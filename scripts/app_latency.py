@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from streamlit.testing.v1 import AppTest
+
+from src import instrumentation
+
+# ---------------------------------------
+# ⏱️ Per-interaction latency of the Streamlit app (headless)
+# ---------------------------------------
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "streamlit_app", "app.py"))
+
+# (name, widget type, label, new value, sections its fragment reruns; None = whole script)
+INTERACTIONS = [
+    ("weight slider", "slider", "Income (GDP per capita)", 0.5, None),
+    ("country A", "selectbox", "Country A", "Japan", ["app.radar"]),
+    ("similar to", "selectbox", "Find countries similar to", "Spain", ["app.similarity"]),
+    ("trend window", "slider", "Years averaged per point", 3, ["app.trajectories"]),
+    ("forecast country", "selectbox", "Select a country", "Spain", ["app.history", "app.forecast"]),
+    ("forecast horizon", "slider", "Years to forecast", 10, ["app.history", "app.forecast"])
+]
+
+
+def _widget(at, kind, label):
+    return next(w for w in getattr(at, kind) if w.label == label)
+
+
+def measure_interactions(repeat=3):
+    """
+    Runs the app once, then applies each interaction `repeat` times (alternating
+    values so every run is a real change).
+
+    AppTest always re-executes the whole script, so besides that wall time the
+    time spent in the sections the widget's fragment reruns is reported: the
+    latency of a fragment-scoped rerun in a live session.
+    """
+    instrumentation.enable(output=None)
+    at = AppTest.from_file(APP_PATH, default_timeout=300)
+    start = time.perf_counter()
+    at.run()
+    seconds = round(time.perf_counter() - start, 4)
+    results = [{"interaction": "first paint", "seconds": seconds, "rerun_seconds": seconds, "scope": "script"}]
+
+    for name, kind, label, value, scope in INTERACTIONS:
+        original = _widget(at, kind, label).value
+        timings, scoped = [], []
+        for n in range(repeat):
+            instrumentation.clear_records()
+            widget = _widget(at, kind, label)
+            start = time.perf_counter()
+            widget.set_value(value if n % 2 == 0 else original).run()
+            timings.append(time.perf_counter() - start)
+            if at.exception:
+                raise RuntimeError(f"{name}: {at.exception[0].value}")
+            if scope is None:
+                scoped.append(timings[-1])
+            else:
+                scoped.append(sum(r["seconds"] for r in instrumentation.get_records() if r["stage"] in scope))
+        results.append({
+            "interaction": name,
+            "seconds": round(min(timings), 4),
+            "rerun_seconds": round(min(scoped), 4),
+            "scope": "script" if scope is None else ", ".join(scope)
+        })
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-interaction latency of the Streamlit app")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Optional JSON file for the results")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = measure_interactions(args.repeat)
+
+    print(f"  {'interaction':<18} {'full run':>12} {'rerun scope':>12}")
+    for r in results:
+        print(f"  {r['interaction']:<18} {r['seconds'] * 1000:9.1f} ms {r['rerun_seconds'] * 1000:9.1f} ms  ({r['scope']})")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
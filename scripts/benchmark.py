@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import platform
+import zipfile
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.preprocessing import load_and_clean_indicator, load_and_clean_indicators, aggregate_historical
+from src.scoring import compute_relocation_score
+from src.predictive import predict_linear_trend, predict_random_forest_trend, forecast_linear_batch
+from src.wdi_bulk import import_wdi_bulk
+
+# ---------------------------------------
+# 📏 Synthetic-scale benchmarks for load → impute → merge → score → forecast
+# ---------------------------------------
+
+# Indicators the scoring step needs; extra synthetic ones are added on top
+CORE_INDICATORS = [
+    "gdp_per_capita", "inflation", "unemployment",
+    "population", "gini_index", "education_spending_gdp"
+]
+
+PRESETS = {
+    "small": {"countries": 20, "years": 20, "indicators": 6},
+    "medium": {"countries": 200, "years": 40, "indicators": 50},
+    "large": {"countries": 2000, "years": 60, "indicators": 1000}
+}
+
+WEIGHTS = {
+    "gdp": 0.30, "gini": 0.20, "education": 0.15, "maternity": 0.10,
+    "employment": 0.05, "stability": 0.05, "hdi": 0.15
+}
+
+
+def generate_dataset(out_dir, countries, years, indicators, missing=0.1, seed=0):
+    """
+    Writes World Bank-shaped CSVs (country, country_code, date, value) and an HDI
+    file (Entity, Code, Year, Human Development Index) of the requested size.
+
+    Returns:
+        (indicator names, raw dir, HDI path)
+    """
+    rng = np.random.default_rng(seed)
+    raw_dir = os.path.join(out_dir, "raw")
+    os.makedirs(raw_dir, exist_ok=True)
+
+    codes = [f"C{i:04d}" for i in range(countries)]
+    names = [f"Country {i}" for i in range(countries)]
+    dates = np.arange(2023 - years + 1, 2024)
+    names_col = np.repeat(names, years)
+    codes_col = np.repeat(codes, years)
+    dates_col = np.tile(dates[::-1], countries)
+
+    indicator_names = CORE_INDICATORS[:indicators] + [
+        f"indicator_{k:04d}" for k in range(max(0, indicators - len(CORE_INDICATORS)))
+    ]
+    for name in indicator_names:
+        level = rng.uniform(1, 100, size=countries)
+        trend = rng.normal(0, 0.02, size=countries)
+        t = np.arange(years)[::-1]
+        values = (level[:, None] * (1 + trend[:, None] * t) + rng.normal(0, 1, (countries, years))).ravel()
+        values[rng.random(values.size) < missing] = np.nan
+        pd.DataFrame({
+            "country": names_col, "country_code": codes_col, "date": dates_col, "value": values
+        }).to_csv(os.path.join(raw_dir, f"{name}_worldbank.csv"), index=False)
+
+    hdi_path = os.path.join(out_dir, "hdi_historical.csv")
+    pd.DataFrame({
+        "Entity": names_col,
+        "Code": codes_col,
+        "Year": dates_col,
+        "Human Development Index": rng.uniform(0.3, 0.95, size=countries * years).round(3)
+    }).to_csv(hdi_path, index=False)
+
+    return indicator_names, raw_dir, hdi_path
+
+
+def generate_wdi_archive(out_dir, countries, years, indicators, seed=0):
+    """
+    Writes a WDI-style bulk ZIP (wide year columns, one row per country × indicator),
+    streamed indicator by indicator so large presets never sit in memory.
+
+    Returns:
+        (archive path, {indicator code: name}, country codes)
+    """
+    rng = np.random.default_rng(seed)
+    codes = [f"C{i:04d}" for i in range(countries)]
+    year_columns = [str(year) for year in range(2023 - years + 1, 2024)]
+    indicator_codes = {f"SYN.{k:04d}": f"indicator_{k:04d}" for k in range(indicators)}
+
+    path = os.path.join(out_dir, "WDI_CSV.zip")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("WDICSV.csv", "w") as stream:
+            header = True
+            for code, name in indicator_codes.items():
+                values = rng.uniform(1, 100, size=(countries, years))
+                values[rng.random(values.shape) < 0.1] = np.nan
+                frame = pd.DataFrame(values, columns=year_columns)
+                frame.insert(0, "Country Name", [f"Country {i}" for i in range(countries)])
+                frame.insert(1, "Country Code", codes)
+                frame.insert(2, "Indicator Name", name)
+                frame.insert(3, "Indicator Code", code)
+                stream.write(frame.to_csv(index=False, header=header).encode("utf-8"))
+                header = False
+        archive.writestr("WDISeries.csv", "Series Code,Indicator Name\n")
+
+    return path, indicator_codes, codes
+
+
+# Modules the measured code imports lazily; loaded up front so no stage pays for them
+WARM_IMPORTS = ["sklearn.preprocessing", "sklearn.linear_model", "sklearn.ensemble"]
+REPEAT = 3
+
+
+def warm_imports():
+    for module in WARM_IMPORTS:
+        importlib.import_module(module)
+
+
+def measure(stage, func, results, size, rows=None, repeat=REPEAT):
+    """
+    Records the wall time of `func` (fastest of `repeat` untraced runs) and, in a
+    separate run under tracemalloc, its peak traced memory. Tracing slows
+    Python-heavy code several-fold, so it never overlaps the timed runs.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        timings.append(time.perf_counter() - start)
+        del output
+    seconds = min(timings)
+
+    tracemalloc.start()
+    output = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results.append({
+        "size": size,
+        "stage": stage,
+        "seconds": round(seconds, 6),
+        "repeat": repeat,
+        "peak_mb": round(peak / 2 ** 20, 3),
+        "rows": rows(output) if rows else None
+    })
+    print(f"  {stage:<34} {seconds:9.3f} s  {peak / 2 ** 20:9.1f} MB")
+    return output
+
+
+def footprint(df):
+    """
+    Deep memory of a frame in MB.
+    """
+    return round(df.memory_usage(deep=True).sum() / 2 ** 20, 3)
+
+
+def panel_footprint(results, size, raw_dir, indicators):
+    """
+    Resident size of the cleaned wide panel: compact schema (float64 / float32)
+    against the same data with string keys and int64 years.
+    """
+    compact = load_and_clean_indicators(indicators, raw_path=raw_dir)
+    schemas = {
+        "object keys, float64": compact.astype({"country": object, "country_code": object, "date": "int64"}),
+        "compact, float64": compact,
+        "compact, float32": compact.astype({ind: "float32" for ind in indicators})
+    }
+    baseline = footprint(schemas["object keys, float64"])
+    for schema, df in schemas.items():
+        mb = footprint(df)
+        stage = f"panel_footprint [{schema}]"
+        results.append({"size": size, "stage": stage, "frame_mb": mb, "rows": len(df)})
+        print(f"  {stage:<34} {mb:9.1f} MB resident ({mb / baseline:.0%})")
+    del compact, schemas
+
+
+def run_size(size, forecast_series=10, seed=0, repeat=REPEAT):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        indicators, raw_dir, hdi_path = generate_dataset(tmp, seed=seed, **size)
+        print(f"📊 {size['countries']} countries × {size['years']} years × {size['indicators']} indicators")
+
+        dfs = measure("load_and_clean_indicator", lambda: [
+            load_and_clean_indicator(os.path.join(raw_dir, f"{ind}_worldbank.csv"), ind)
+            for ind in indicators
+        ], results, size, rows=lambda out: sum(len(df) for df in out), repeat=repeat)
+
+        merged = measure("aggregate_historical", lambda: aggregate_historical(dfs),
+                         results, size, rows=len, repeat=repeat)
+        panel_footprint(results, size, raw_dir, indicators)
+
+        if set(CORE_INDICATORS) <= set(indicators):
+            hdi = pd.read_csv(hdi_path).rename(columns={
+                "Code": "country_code", "Year": "date", "Human Development Index": "hdi"
+            })[["country_code", "date", "hdi"]]
+            scoring_input = merged.assign(date=merged["date"].round()).merge(hdi, on=["country_code", "date"], how="left")
+            context_df = pd.DataFrame({
+                "country": merged["country"],
+                "maternity_score": np.random.default_rng(seed).integers(1, 6, len(merged))
+            })
+            measure("compute_relocation_score",
+                    lambda: compute_relocation_score(scoring_input, context_df, WEIGHTS),
+                    results, size, rows=len, repeat=repeat)
+
+        panel = dfs[0]
+        series = panel["country"].unique()[:forecast_series]
+        indicator = indicators[0]
+        measure(f"predict_linear_trend x{len(series)}", lambda: [
+            predict_linear_trend(panel, country, indicator) for country in series
+        ], results, size, repeat=repeat)
+        measure(f"predict_random_forest_trend x{len(series)}", lambda: [
+            predict_random_forest_trend(panel, country, indicator) for country in series
+        ], results, size, repeat=repeat)
+        measure("forecast_linear_batch", lambda: forecast_linear_batch(panel, [indicator]),
+                results, size, rows=len, repeat=repeat)
+
+        # Bulk import keeps a small subset of a full-size archive
+        archive, indicator_codes, codes = generate_wdi_archive(tmp, seed=seed, **size)
+        wanted = dict(list(indicator_codes.items())[:len(CORE_INDICATORS)])
+        measure("import_wdi_bulk", lambda: import_wdi_bulk(
+            archive, indicators=wanted, countries=codes[:20], start_year=2023 - size["years"] + 1,
+            end_year=2023, output_dir=os.path.join(tmp, "wdi")
+        ), results, size, rows=lambda out: sum(out.values()), repeat=repeat)
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Prints the slowdown of each stage against a previous results file and returns
+    the stages slower than `threshold`×. Both sides are best-of-N untraced timings.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(json.dumps(r["size"], sort_keys=True), r["stage"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\n🔍 Comparison with {baseline_path}")
+    for r in results:
+        base = baseline.get((json.dumps(r["size"], sort_keys=True), r["stage"]))
+        if not base or not base.get("seconds"):
+            continue
+        if "seconds" not in r:
+            continue
+        ratio = r["seconds"] / base["seconds"]
+        flag = "⚠️" if ratio > threshold else "  "
+        print(f"{flag} {r['stage']:<34} {ratio:6.2f}× time  {r['peak_mb'] - base['peak_mb']:+9.1f} MB")
+        if ratio > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Synthetic-scale performance benchmarks")
+    parser.add_argument("--preset", action="append", choices=sorted(PRESETS),
+                        help="Dataset size preset (repeatable, default: small)")
+    parser.add_argument("--countries", type=int, help="Custom size: number of countries")
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--indicators", type=int, default=6)
+    parser.add_argument("--forecast-series", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Timed runs per stage (the fastest is kept)")
+    parser.add_argument("--output", default=None, help="Results JSON (default: data/benchmarks/<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio counted as a regression")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    sizes = [PRESETS[name] for name in (args.preset or [])]
+    if args.countries:
+        sizes.append({"countries": args.countries, "years": args.years, "indicators": args.indicators})
+    sizes = sizes or [PRESETS["small"]]
+
+    warm_imports()
+    results = [r for size in sizes for r in run_size(size, forecast_series=args.forecast_series, repeat=args.repeat)]
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output_path = args.output or os.path.join("data", "benchmarks", f"{timestamp}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "timestamp": timestamp,
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__
+            },
+            "results": results
+        }, f, indent=2)
+    print(f"✅ Results saved to {output_path}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
@@ -0,0 +1,76 @@
+import os
+import sys
+import argparse
+import subprocess
+
+# ---------------------------------------
+# ⏱️ Import-time budget for the app's first paint
+# ---------------------------------------
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# What streamlit_app/app.py imports at module level (streamlit itself excluded)
+STARTUP_MODULES = ["pandas", "src.preprocessing", "src.scoring", "src.pipeline", "src.instrumentation"]
+
+# Only the chart / forecast sections may pull these in
+DEFERRED_MODULES = ["sklearn", "seaborn", "matplotlib"]
+
+
+def measure_imports(modules):
+    """
+    Imports `modules` in a fresh interpreter with -X importtime.
+
+    Returns:
+        (total seconds, {top-level module: cumulative seconds})
+    """
+    code = "import " + ", ".join(modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue  # header line or nested import
+        top = name.strip().split(".")[0]
+        timings[top] = timings.get(top, 0.0) + int(cumulative) / 1e6
+    return sum(timings.values()), timings
+
+
+def loaded_modules(modules):
+    code = "import sys, " + ", ".join(modules) + "; print('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the app's startup import time")
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum import time in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs to take the fastest of")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level packages to list")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    total, timings = min((measure_imports(STARTUP_MODULES) for _ in range(args.repeat)), key=lambda r: r[0])
+    print(f"📦 Startup imports: {total:.3f} s (budget {args.budget:.3f} s)")
+    for name, seconds in sorted(timings.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<24} {seconds:7.3f} s")
+
+    failed = False
+    eager = sorted(m for m in DEFERRED_MODULES if m in loaded_modules(STARTUP_MODULES))
+    if eager:
+        print(f"⚠️ Imported at startup but should be deferred: {', '.join(eager)}")
+        failed = True
+    if total > args.budget:
+        print("⚠️ Import time over budget")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Within budget")
@@ -1,63 +1,30 @@
 import os
-import csv
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
+import sys
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.hdi_import import import_hdi, UNDP_COMPOSITE_URL
+from src.preprocessing import HDI_PATH
 
 # ---------------------------------------
-# 📊 Extract HDI values from UNDP chart
+# 📊 Refresh HDI values without a browser
 # ---------------------------------------
 
-options = Options()
-# options.add_argument("--headless=new")
-options.add_argument("--disable-gpu")
-options.add_argument("--no-sandbox")
-
-print("🚀 Launching browser...")
-driver = webdriver.Chrome(options=options)
-
-try:
-    print("🌐 Loading HDI page...")
-    driver.get("https://hdr.undp.org/data-center/human-development-index#/indicies/HDI")
-
-    print("⌛ Waiting for chart data...")
-    WebDriverWait(driver, 30).until(
-        lambda d: d.execute_script("return typeof Highcharts !== 'undefined' && Highcharts.charts.length > 0")
-    )
-
-    print("📥 Extracting HDI data...")
-    script = """
-        const chart = Highcharts.charts[0];
-        const result = [];
-        chart.series.forEach(s => {
-            const country = s.name;
-            if (!country) return;
-            s.data.forEach(point => {
-                if (point.y !== null) {
-                    result.push({
-                        country: country,
-                        year: point.x,
-                        hdi: point.y
-                    });
-                }
-            });
-        });
-        return result;
-    """
-    data = driver.execute_script(script)
-
-    if not data:
-        raise ValueError("⚠️ No HDI data extracted.")
-
-    output_path = os.path.join("data", "external", "hdi_historical.csv")
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    with open(output_path, mode="w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["country", "year", "hdi"])
-        writer.writeheader()
-        writer.writerows(data)
-
-    print(f"✅ HDI data saved to: {output_path}")
-
-finally:
-    driver.quit()
\ No newline at end of file
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge UNDP HDI data into the historical HDI file")
+    parser.add_argument("source", nargs="?", default=None,
+                        help="Saved UNDP composite-indices CSV or chart payload (.json); "
+                             f"downloads {UNDP_COMPOSITE_URL} when omitted")
+    parser.add_argument("--output", default=HDI_PATH)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    print(f"📥 Importing HDI data from {args.source or 'the UNDP composite indices'}...")
+    stats = import_hdi(args.source, args.output)
+    print(f"✅ {args.output}: {stats['added']} rows added, {stats['updated']} updated, "
+          f"{stats['unchanged']} unchanged")
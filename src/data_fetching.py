@@ -1,7 +1,14 @@
 import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 
+from src.instrumentation import instrumented
+
 os.makedirs("data/raw", exist_ok=True)
 
 # 🌍 List of countries: Europe, Asia, and the UK
@@ -21,48 +28,292 @@ INDICATORS_DICT = {
     "SE.XPD.TOTL.GD.ZS": "education_spending_gdp"        # Education spending (% of GDP)
 }
 
-# 🏦 Base function for a single indicator and country
-def fetch_world_bank_data(indicator, countries, start_year=2003, end_year=2023):
+# ⚙️ API / concurrency settings
+API_BASE_URL = "http://api.worldbank.org/v2"
+PER_PAGE = 1000
+COUNTRIES_PER_REQUEST = 40      # semicolon-joined codes per query (keeps URLs short)
+MAX_WORKERS = 8                 # concurrent requests in flight
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# 🗂️ Incremental refresh cache: records what has been retrieved per indicator
+FETCH_CACHE_FILE = "fetch_cache.json"
+
+
+def make_session(max_workers=MAX_WORKERS):
+    """
+    Creates a requests session whose connection pool is sized for the worker count.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_file(url, path, chunk_bytes=1 << 20, timeout=60):
+    """
+    Streams a (large) file to `path` without holding it in memory; the file only
+    appears once complete.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(tmp_path, "wb") as f:
+            for block in response.iter_content(chunk_size=chunk_bytes):
+                f.write(block)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _get_json(session, url, params, max_retries=MAX_RETRIES, backoff=BACKOFF_SECONDS):
+    """
+    GET with retry on rate limiting / server errors. Honours `Retry-After` when present,
+    otherwise backs off exponentially.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.get(url, params=params, timeout=30)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+            continue
+
+        if response.status_code in RETRY_STATUS and attempt < max_retries:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = backoff * 2 ** attempt
+            time.sleep(delay)
+            continue
+
+        response.raise_for_status()
+        return response.json()
+
+
+def _fetch_pages(session, url, params):
+    """
+    Follows the `pages` metadata of a World Bank response and returns all entries.
+    """
+    entries = []
+    page = 1
+    while True:
+        data = _get_json(session, url, {**params, "page": page})
+
+        # Errors come back as a single-element list with a "message" key
+        if not data or len(data) < 2 or data[1] is None:
+            break
+
+        entries.extend(data[1])
+        pages = int(data[0].get("pages", 1) or 1)
+        if page >= pages:
+            break
+        page += 1
+    return entries
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _fetch_batch(session, indicator, countries, start_year, end_year, base_url):
+    url = f"{base_url}/country/{';'.join(countries)}/indicator/{indicator}"
+    params = {
+        "format": "json",
+        "date": f"{start_year}:{end_year}",
+        "per_page": PER_PAGE
+    }
+    entries = _fetch_pages(session, url, params)
+
+    if not entries:
+        print(f"No data for {';'.join(countries)} - {indicator}")
+
+    return [
+        {
+            "country": entry["country"]["value"],
+            "country_code": entry.get("countryiso3code") or entry["country"]["id"],
+            "date": entry["date"],
+            "value": entry["value"]
+        }
+        for entry in entries
+    ]
+
+
+def _fetch_lastupdated(session, indicator, countries, base_url):
+    """
+    Cheap probe (one row) that returns the indicator's `lastupdated` stamp.
+    """
+    url = f"{base_url}/country/{countries[0]}/indicator/{indicator}"
+    data = _get_json(session, url, {"format": "json", "per_page": 1})
+    if not data or not isinstance(data[0], dict):
+        return None
+    return data[0].get("lastupdated")
+
+
+def to_long_frame(rows, countries):
+    """
+    Builds the long-format frame, ordered like the requested countries (latest year first).
+    """
+    df = pd.DataFrame(rows, columns=["country", "country_code", "date", "value"])
+    df["date"] = df["date"].astype(int)
+    order = {code: i for i, code in enumerate(countries)}
+    df["_order"] = df["country_code"].map(order)
+    df = df.sort_values(["_order", "date"], ascending=[True, False], kind="stable")
+    return df.drop(columns="_order").reset_index(drop=True)
+
+
+# 🏦 Base function for a single indicator and a list of countries
+@instrumented()
+def fetch_world_bank_data(indicator, countries, start_year=2003, end_year=2023,
+                          session=None, base_url=API_BASE_URL, max_workers=MAX_WORKERS):
     """
     Downloads data from the World Bank for a given indicator and list of countries.
 
+    Countries are requested in semicolon-joined batches over a shared connection pool.
+
     Returns:
         pd.DataFrame with columns: country, country_code, date, value
     """
-    all_data = []
+    session = session or make_session(max_workers)
+    batches = list(_chunks(list(countries), COUNTRIES_PER_REQUEST))
 
-    for country in countries:
-        url = f"http://api.worldbank.org/v2/country/{country}/indicator/{indicator}"
-        params = {
-            "format": "json",
-            "date": f"{start_year}:{end_year}",
-            "per_page": 1000
-        }
-        response = requests.get(url, params=params)
-        data = response.json()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(
+            lambda batch: _fetch_batch(session, indicator, batch, start_year, end_year, base_url),
+            batches
+        )
+        rows = [row for batch_rows in results for row in batch_rows]
 
-        if not data or len(data) < 2:
-            print(f"No data for {country} - {indicator}")
-            continue
+    return to_long_frame(rows, countries)
+
+
+# 🗂️ Fetch cache helpers
+def fetch_cache_key(indicator, countries, start_year, end_year):
+    """
+    Fetch-cache entry name of one (indicator, country set, year range) request.
+    """
+    return f"{indicator}|{';'.join(sorted(countries))}|{start_year}:{end_year}"
+
+
+def load_fetch_cache(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fetch_cache(cache, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _years_to_fetch(entry, lastupdated, start_year, end_year):
+    """
+    Years that still need a request: never retrieved, or incomplete ones once the
+    indicator has been republished.
+    """
+    all_years = set(range(start_year, end_year + 1))
+    if entry is None:
+        return sorted(all_years)
+
+    missing = all_years - set(entry["years"])
+    if lastupdated != entry.get("lastupdated"):
+        missing |= all_years - set(entry["complete_years"])
+    return sorted(missing)
 
-        for entry in data[1]:
-            all_data.append({
-                "country": entry["country"]["value"],
-                "country_code": country,
-                "date": entry["date"],
-                "value": entry["value"]
-            })
 
-    return pd.DataFrame(all_data)
+def _merge_update(existing, new, countries):
+    """
+    Merges freshly fetched rows into stored data; new non-null values win.
+    """
+    combined = pd.concat([new, existing], ignore_index=True)
+    combined["_has_value"] = combined["value"].notna()
+    combined = combined.sort_values("_has_value", ascending=False, kind="stable")
+    combined = combined.drop_duplicates(["country_code", "date"]).drop(columns="_has_value")
+    return to_long_frame(combined, countries)
+
+
+def complete_years(df, countries):
+    """
+    Years in which every requested country has a value.
+    """
+    counts = df.dropna(subset=["value"]).groupby("date")["country_code"].nunique()
+    return sorted(int(year) for year in counts[counts >= len(countries)].index)
 
 
 # 🔁 Function to fetch multiple indicators
-def fetch_multiple_indicators(countries, indicators, start_year=2003, end_year=2023):
+@instrumented()
+def fetch_multiple_indicators(countries, indicators, start_year=2003, end_year=2023,
+                              base_url=API_BASE_URL, max_workers=MAX_WORKERS, output_dir="data/raw",
+                              incremental=False):
     """
     Downloads and saves multiple indicators from the World Bank for several countries.
+
+    Every (indicator, country batch) request runs on one bounded thread pool that
+    shares a single connection pool. With `incremental=True`, the fetch cache in
+    `output_dir` is consulted and only missing or newly published years are
+    requested and merged into the stored CSVs.
     """
-    for indicator_code, name in indicators.items():
-        print(f"Fetching: {name}")
-        df = fetch_world_bank_data(indicator_code, countries, start_year, end_year)
-        df.to_csv(f"data/raw/{name}_worldbank.csv", index=False)
-        print(f"Saved: data/raw/{name}_worldbank.csv")
\ No newline at end of file
+    countries = list(countries)
+    session = make_session(max_workers)
+    batches = list(_chunks(countries, COUNTRIES_PER_REQUEST))
+    cache_path = os.path.join(output_dir, FETCH_CACHE_FILE)
+    cache = load_fetch_cache(cache_path)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Probe `lastupdated` for every indicator (one small request each)
+        lastupdated = dict(zip(indicators, pool.map(
+            lambda code: _fetch_lastupdated(session, code, countries, base_url),
+            indicators
+        )))
+
+        plan = {}
+        for indicator_code, name in indicators.items():
+            path = os.path.join(output_dir, f"{name}_worldbank.csv")
+            entry = cache.get(fetch_cache_key(indicator_code, countries, start_year, end_year))
+            if not incremental or not os.path.exists(path):
+                entry = None
+            plan[indicator_code] = (entry, _years_to_fetch(entry, lastupdated[indicator_code], start_year, end_year))
+
+        futures = {
+            indicator_code: [
+                pool.submit(_fetch_batch, session, indicator_code, batch, min(years), max(years), base_url)
+                for batch in batches
+            ]
+            for indicator_code, (_, years) in plan.items() if years
+        }
+
+        for indicator_code, name in indicators.items():
+            path = os.path.join(output_dir, f"{name}_worldbank.csv")
+            entry, years = plan[indicator_code]
+            if not years:
+                print(f"Up to date: {name}")
+                continue
+
+            print(f"Fetching: {name} ({min(years)}–{max(years)})")
+            rows = [row for future in futures[indicator_code] for row in future.result()]
+            df = to_long_frame(rows, countries)
+            df = df[df["date"].isin(years)]
+            if entry is not None:
+                df = _merge_update(pd.read_csv(path), df, countries)
+            df.to_csv(path, index=False)
+            print(f"Saved: {path}")
+
+            cache[fetch_cache_key(indicator_code, countries, start_year, end_year)] = {
+                "indicator": indicator_code,
+                "countries": sorted(countries),
+                "start_year": start_year,
+                "end_year": end_year,
+                "years": sorted(set(years) | set(entry["years"] if entry else [])),
+                "complete_years": complete_years(df, countries),
+                "lastupdated": lastupdated[indicator_code],
+            }
+
+    save_fetch_cache(cache, cache_path)
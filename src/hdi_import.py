@@ -0,0 +1,196 @@
+# src/hdi_import.py
+
+import os
+import re
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.data_fetching import download_file
+from src.preprocessing import HDI_PATH
+from src.instrumentation import instrumented, annotate
+
+# 📊 UNDP composite indices, complete time series (one wide CSV: iso3, country, ..., hdi_1990 … hdi_<last>)
+UNDP_COMPOSITE_URL = (
+    "https://hdr.undp.org/sites/default/files/2023-24_HDR/"
+    "HDR23-24_Composite_indices_complete_time_series.csv"
+)
+UNDP_COMPOSITE_PATH = os.path.join("data", "raw", "undp_composite_indices.csv")
+
+# Schema of data/external/hdi_historical.csv, as read by preprocessing.load_hdi
+HDI_COLUMNS = ["Entity", "Code", "Year", "Human Development Index"]
+
+# hdi_<year> only: hdi_f_/hdi_m_ (by sex) and hdi_rank_ columns are other series
+HDI_YEAR_COLUMN = re.compile(r"^hdi_(\d{4})$")
+# UNDP aggregates use codes such as ZZA.VHHD, which are not countries
+ISO3_CODE = re.compile(r"^[A-Z]{3}$")
+
+
+def download_undp_composite(url=UNDP_COMPOSITE_URL, path=UNDP_COMPOSITE_PATH):
+    """
+    Streams the UNDP composite-indices CSV to disk.
+    """
+    return download_file(url, path)
+
+
+def _finish(df):
+    """
+    Pipeline schema, ISO3-coded countries only, one row per (Code, Year).
+    """
+    df = df.dropna(subset=["Human Development Index"])
+    df = df[df["Code"].astype(str).str.fullmatch(ISO3_CODE)]
+    df = df.astype({"Year": int, "Human Development Index": float})
+    return df.drop_duplicates(["Code", "Year"], keep="last")[HDI_COLUMNS].reset_index(drop=True)
+
+
+def read_undp_composite(path):
+    """
+    Reads the HDI series from the UNDP composite-indices CSV (only the iso3,
+    country and hdi_<year> columns are parsed) in the long pipeline schema.
+    """
+    def read(encoding):
+        return pd.read_csv(
+            path,
+            usecols=lambda column: column in ("iso3", "country") or bool(HDI_YEAR_COLUMN.match(column)),
+            dtype={"iso3": str, "country": str},
+            encoding=encoding
+        )
+
+    # Recent releases are UTF-8, older ones Latin-1 (e.g. "Côte d'Ivoire")
+    try:
+        wide = read("utf-8-sig")
+    except UnicodeDecodeError:
+        wide = read("latin-1")
+
+    df = wide.melt(id_vars=["iso3", "country"], var_name="Year", value_name="Human Development Index")
+    df["Year"] = df["Year"].str.extract(HDI_YEAR_COLUMN, expand=False)
+    df = df.rename(columns={"iso3": "Code", "country": "Entity"})
+    return _finish(df)
+
+
+def _series_points(series):
+    """
+    (year, value) pairs of one Highcharts series, whichever point format it uses:
+    [x, y] pairs, {"x": .., "y": ..} objects, or bare y values spaced from pointStart.
+    """
+    start = series.get("pointStart", 0)
+    step = series.get("pointInterval", 1)
+    for n, point in enumerate(series.get("data", [])):
+        if isinstance(point, dict):
+            yield point.get("x", start + n * step), point.get("y")
+        elif isinstance(point, (list, tuple)):
+            yield point[0], point[1]
+        else:
+            yield start + n * step, point
+
+
+def parse_chart_payload(payload, country_codes=None):
+    """
+    Reads HDI series from the data-center chart's JSON payload (a list of
+    Highcharts series, or an object with a "series" list), e.g. as saved from the page.
+
+    Series are named after countries; the ISO3 code comes from the series' own
+    id/code/iso3 field when it has one, else from `country_codes` ({name: ISO3}).
+    Series that cannot be matched to a code are skipped and reported.
+    """
+    if isinstance(payload, (str, bytes)):
+        payload = json.loads(payload)
+    series_list = payload.get("series", []) if isinstance(payload, dict) else payload
+    country_codes = country_codes or {}
+
+    rows, unmatched = [], []
+    for series in series_list:
+        name = series.get("name")
+        code = next((series[key] for key in ("iso3", "code", "id")
+                     if isinstance(series.get(key), str) and ISO3_CODE.match(series[key])), None)
+        code = code or country_codes.get(name)
+        if code is None:
+            unmatched.append(name)
+            continue
+        rows.extend((name, code, year, value) for year, value in _series_points(series) if value is not None)
+
+    if unmatched:
+        print(f"⚠️ No ISO3 code for {len(unmatched)} series: {', '.join(map(str, unmatched[:10]))}")
+    return _finish(pd.DataFrame(rows, columns=HDI_COLUMNS))
+
+
+def read_hdi_source(path, country_codes=None):
+    """
+    Parses a saved HDI source by extension: the UNDP CSV or a chart payload (.json).
+    """
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return parse_chart_payload(json.load(f), country_codes)
+    return read_undp_composite(path)
+
+
+def load_hdi_table(path=HDI_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=HDI_COLUMNS)
+    return pd.read_csv(path, dtype={"Entity": str, "Code": str})
+
+
+def merge_hdi(new, path=HDI_PATH):
+    """
+    Merges new HDI rows into the historical CSV: (Code, Year) pairs already present
+    take the new value, missing ones are added, everything else (other years,
+    regional aggregates without a code) is kept. Existing entity names win so
+    that country labels stay stable across sources.
+
+    The file is only rewritten when something changed (so load_hdi's cache and the
+    published build stay valid), and is replaced atomically.
+
+    Returns:
+        dict with the number of added, updated and unchanged rows
+    """
+    current = load_hdi_table(path)
+    coded = current.dropna(subset=["Code"])
+    names = coded.drop_duplicates("Code", keep="last").set_index("Code")["Entity"]
+    new = new.assign(Entity=new["Code"].map(names).fillna(new["Entity"]))
+
+    old_values = coded.set_index(["Code", "Year"])["Human Development Index"]
+    keys = pd.MultiIndex.from_frame(new[["Code", "Year"]])
+    previous = old_values.reindex(keys).to_numpy(dtype=float)
+    incoming = new["Human Development Index"].to_numpy(dtype=float)
+    added = np.isnan(previous)
+    updated = ~added & (previous != incoming)
+    stats = {"added": int(added.sum()), "updated": int(updated.sum()),
+             "unchanged": int(len(new) - added.sum() - updated.sum())}
+    annotate(**stats)
+    if not (added.any() or updated.any()):
+        return stats
+
+    replaced = pd.MultiIndex.from_frame(current[["Code", "Year"]]).isin(keys) & current["Code"].notna()
+    merged = pd.concat([current[~replaced], new[HDI_COLUMNS]], ignore_index=True)
+    merged = merged.sort_values(["Entity", "Year"], kind="stable")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    merged.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return stats
+
+
+@instrumented()
+def import_hdi(source=None, path=HDI_PATH):
+    """
+    Refreshes data/external/hdi_historical.csv without a browser.
+
+    Args:
+        source: saved UNDP CSV or chart payload (.json); None downloads the UNDP CSV first
+
+    Returns:
+        merge statistics (see merge_hdi)
+    """
+    if source is None:
+        source = download_undp_composite()
+
+    # Names already in the file resolve chart series that carry no code
+    current = load_hdi_table(path).dropna(subset=["Code"])
+    country_codes = dict(zip(current["Entity"], current["Code"]))
+
+    new = read_hdi_source(source, country_codes)
+    if new.empty:
+        raise ValueError(f"⚠️ No HDI data found in {source}")
+    return merge_hdi(new, path)
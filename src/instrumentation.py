@@ -0,0 +1,183 @@
+# src/instrumentation.py
+
+import os
+import json
+import time
+import functools
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Enable with RELOCATION_PROFILE=1 (or a path to the JSON-lines output) or main.py --profile;
+# peak memory is only traced with RELOCATION_PROFILE_MEMORY=1 / --profile-memory
+ENV_VAR = "RELOCATION_PROFILE"
+MEMORY_ENV_VAR = "RELOCATION_PROFILE_MEMORY"
+DEFAULT_OUTPUT = os.path.join("data", "processed", "profile.jsonl")
+# Process-wide records kept in memory (oldest dropped first)
+MAX_RECORDS = 10_000
+
+_state = {"enabled": False, "output": None, "records": deque(maxlen=MAX_RECORDS),
+          "trace_memory": False, "started_tracing": False}
+_local = threading.local()
+_lock = threading.Lock()
+
+def enable(output=DEFAULT_OUTPUT, trace_memory=False):
+    """
+    Turns instrumentation on. Records are kept in memory and, if `output` is set,
+    appended to it as JSON lines.
+
+    With `trace_memory`, tracemalloc runs for the whole process and records gain
+    peak_mb. Tracing slows Python-heavy stages several-fold, so their `seconds`
+    are then flagged as traced and are not comparable to production timings.
+    """
+    _state["enabled"] = True
+    _state["output"] = output
+    _state["trace_memory"] = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state["started_tracing"] = True
+
+def disable():
+    _state["enabled"] = False
+    _state["trace_memory"] = False
+    # Only stop tracing this module started
+    if _state["started_tracing"]:
+        tracemalloc.stop()
+        _state["started_tracing"] = False
+
+def is_enabled():
+    return _state["enabled"]
+
+def get_records():
+    """
+    Every record of the process, from all threads.
+    """
+    with _lock:
+        return list(_state["records"])
+
+def clear_records():
+    with _lock:
+        _state["records"].clear()
+
+def start_run():
+    """
+    Starts collecting this thread's records separately, e.g. for one Streamlit
+    session's rerun (each runs on its own script thread), and returns the list.
+    Records of other sessions and of background threads never land in it.
+    """
+    _local.run_records = []
+    return _local.run_records
+
+def run_records():
+    """
+    Records of the current thread since its last start_run() (empty if none).
+    """
+    return list(getattr(_local, "run_records", None) or [])
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+def annotate(**fields):
+    """
+    Adds fields (e.g. cache="hit", rows=123) to the innermost active stage.
+    No-op when disabled or outside a stage.
+    """
+    if _state["enabled"] and _stack():
+        _stack()[-1]["fields"].update(fields)
+
+def _emit(record):
+    collected = getattr(_local, "run_records", None)
+    if collected is not None:
+        collected.append(record)
+    with _lock:
+        _state["records"].append(record)
+        if _state["output"]:
+            os.makedirs(os.path.dirname(_state["output"]) or ".", exist_ok=True)
+            with open(_state["output"], "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+@contextmanager
+def stage(name, **fields):
+    """
+    Times a block and records wall time, any annotated fields and, when memory
+    tracing is on, peak traced memory.
+    """
+    if not _state["enabled"]:
+        yield
+        return
+    if not _state["trace_memory"]:
+        start = time.perf_counter()
+        frame = {"fields": dict(fields)}
+        _stack().append(frame)
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            _stack().pop()
+            _emit({"ts": time.time(), "stage": name, "seconds": round(seconds, 6), **frame["fields"]})
+        return
+
+    current, peak = tracemalloc.get_traced_memory()
+    stack = _stack()
+    if stack:
+        stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+    tracemalloc.reset_peak()
+    frame = {"fields": dict(fields), "peak": 0}
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        _, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, frame["peak"])
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        _emit({
+            "ts": time.time(),
+            "stage": name,
+            "seconds": round(seconds, 6),
+            "peak_mb": round(max(peak - current, 0) / 2 ** 20, 3),
+            "memory_traced": True,  # seconds include tracemalloc overhead
+            **frame["fields"]
+        })
+
+def _count_rows(output):
+    if isinstance(output, tuple) and output:
+        output = output[0]
+    if isinstance(output, (pd.DataFrame, pd.Series)):
+        return len(output)
+    return None
+
+def instrumented(name=None):
+    """
+    Decorator recording a stage per call; a single flag check when disabled.
+    """
+    def decorator(func):
+        stage_name = name or f"{func.__module__.split('.')[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state["enabled"]:
+                return func(*args, **kwargs)
+            with stage(stage_name):
+                output = func(*args, **kwargs)
+                rows = _count_rows(output)
+                if rows is not None:
+                    annotate(rows=rows)
+                return output
+        return wrapper
+    return decorator
+
+# Environment switch: "1"/"true" → default output file, anything else → that path
+_env = os.environ.get(ENV_VAR, "").strip()
+_memory_env = os.environ.get(MEMORY_ENV_VAR, "").strip().lower()
+if _env and _env.lower() not in ("0", "false", "no"):
+    enable(DEFAULT_OUTPUT if _env.lower() in ("1", "true", "yes") else _env,
+           trace_memory=_memory_env in ("1", "true", "yes"))
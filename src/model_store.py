@@ -0,0 +1,180 @@
+# src/model_store.py
+
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.predictive import predict_linear_trend, predict_random_forest_trend, RANDOM_FOREST_PARAMS, INTERVAL_LEVEL
+from src.instrumentation import instrumented, annotate
+
+# On-disk forecast cache (one pickled prediction table per entry, LRU by mtime).
+# Series fitted by pretrain_forecasts are pinned (listed in PINNED_FILE) and never
+# evicted; MAX_ENTRIES caps the on-demand entries added on top of them.
+MODEL_STORE_DIR = os.path.join("data", "processed", "models")
+MAX_ENTRIES = 2000
+PINNED_FILE = "pinned.json"
+# Forecasts are stored for this many years and sliced to the requested horizon
+STORED_HORIZON = 30
+
+FORECAST_COLUMNS = ["country", "indicator", "year", "prediction", "lower", "upper"]
+
+def _predict_linear_with_bands(df, country, indicator, years_ahead):
+    # Stored forecasts carry the lower / upper band the app draws
+    return predict_linear_trend(df, country, indicator, years_ahead, intervals=True)
+
+MODELS = {
+    "random_forest": (predict_random_forest_trend, RANDOM_FOREST_PARAMS),
+    "linear": (_predict_linear_with_bands, {})
+}
+
+def _series(df, country, indicator):
+    return df.loc[df["country"] == country, ["date", indicator]].sort_values("date")
+
+def forecast_key(series, country, indicator, model="random_forest"):
+    """
+    Cache key from (country, indicator, data content hash, model params, interval level).
+    """
+    _, params = MODELS[model]
+    data_hash = hashlib.sha256(np.ascontiguousarray(series.to_numpy(dtype=float)).tobytes()).hexdigest()
+    payload = json.dumps([country, indicator, data_hash, model, params, INTERVAL_LEVEL], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _entry_path(key, store_dir):
+    return os.path.join(store_dir, f"{key}.pkl")
+
+def _load_pinned(store_dir=MODEL_STORE_DIR):
+    path = os.path.join(store_dir, PINNED_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return set(json.load(f))
+
+def _save_pinned(keys, store_dir):
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, PINNED_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(sorted(keys), f)
+    os.replace(tmp_path, path)
+
+def _evict(store_dir, max_entries):
+    """
+    Removes the least recently used unpinned entries beyond `max_entries`
+    (in-flight temporary files of other processes are never touched).
+    """
+    pinned = _load_pinned(store_dir)
+    entries = [e for e in os.scandir(store_dir) if e.name.endswith(".pkl") and e.name[:-len(".pkl")] not in pinned]
+    if len(entries) <= max_entries:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime_ns)
+    for entry in entries[:len(entries) - max_entries]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+def _store(pred_df, key, store_dir, max_entries=None):
+    """
+    Writes one entry atomically; evicts afterwards unless `max_entries` is None.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = f"{_entry_path(key, store_dir)}.{os.getpid()}.tmp"
+    pred_df.to_pickle(tmp_path)
+    os.replace(tmp_path, _entry_path(key, store_dir))
+    if max_entries is not None:
+        _evict(store_dir, max_entries)
+
+def _fit(series, country, indicator, model, years_ahead):
+    predict, _ = MODELS[model]
+    pred_df, _ = predict(series.assign(country=country), country, indicator, years_ahead)
+    return pred_df
+
+@instrumented()
+def lookup_forecast(df, country, indicator, years_ahead=20, model="random_forest", store_dir=MODEL_STORE_DIR):
+    """
+    Stored forecast for one series (same data and model parameters), or None on a miss.
+    """
+    series = _series(df, country, indicator)
+    path = _entry_path(forecast_key(series, country, indicator, model), store_dir)
+
+    if os.path.exists(path):
+        pred_df = pd.read_pickle(path)
+        if len(pred_df) >= years_ahead:
+            os.utime(path)  # mark as recently used
+            return pred_df.head(years_ahead).reset_index(drop=True)
+    return None
+
+def cached_forecast(df, country, indicator, years_ahead=20, model="random_forest",
+                    store_dir=MODEL_STORE_DIR, max_entries=MAX_ENTRIES):
+    """
+    Forecast for one series, served from the on-disk store when the same data and
+    model parameters were fitted before. Misses are fitted and stored.
+    """
+    pred_df = lookup_forecast(df, country, indicator, years_ahead, model, store_dir)
+    if pred_df is not None:
+        annotate(cache="hit")
+        return pred_df
+
+    annotate(cache="miss")
+    series = _series(df, country, indicator)
+    pred_df = _fit(series, country, indicator, model, max(years_ahead, STORED_HORIZON))
+    _store(pred_df, forecast_key(series, country, indicator, model), store_dir, max_entries)
+    return pred_df.head(years_ahead).reset_index(drop=True)
+
+def _pretrain_worker(series, country, indicator, model, years_ahead):
+    return _fit(series, country, indicator, model, years_ahead)
+
+@instrumented()
+def pretrain_forecasts(df, indicators, model="random_forest", years_ahead=STORED_HORIZON,
+                       n_jobs=None, store_dir=MODEL_STORE_DIR, max_entries=MAX_ENTRIES):
+    """
+    Fits every (country, indicator) series missing from the store across a process pool,
+    so interactive forecasts become cache hits. Returns the number of series trained.
+
+    The whole pretrained set is pinned against eviction (replacing the previous
+    pin list, so entries of outdated data become evictable); the store is evicted
+    once, after all entries are written.
+    """
+    pinned, jobs = set(), []
+    for country in df["country"].unique():
+        for indicator in indicators:
+            series = _series(df, country, indicator)
+            if series[indicator].isna().any() or series.empty:
+                continue
+            key = forecast_key(series, country, indicator, model)
+            pinned.add(key)
+            if not os.path.exists(_entry_path(key, store_dir)):
+                jobs.append((key, series, country, indicator))
+    annotate(rows=len(jobs))
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = {
+            pool.submit(_pretrain_worker, series, country, indicator, model, years_ahead): key
+            for key, series, country, indicator in jobs
+        }
+        for future, key in futures.items():
+            _store(future.result(), key, store_dir)
+
+    _save_pinned(pinned, store_dir)
+    if os.path.isdir(store_dir):
+        _evict(store_dir, max_entries)
+    return len(jobs)
+
+def stored_forecasts(df, indicators, model="random_forest", store_dir=MODEL_STORE_DIR):
+    """
+    Collects the stored forecasts of every (country, indicator) series without fitting
+    anything. Returns a long frame: country, indicator, year, prediction, lower, upper.
+    """
+    frames = []
+    for country in df["country"].unique():
+        for indicator in indicators:
+            path = _entry_path(forecast_key(_series(df, country, indicator), country, indicator, model), store_dir)
+            if os.path.exists(path):
+                frames.append(pd.read_pickle(path).assign(country=country, indicator=indicator))
+    if not frames:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[FORECAST_COLUMNS]
@@ -0,0 +1,369 @@
+# src/pipeline.py
+
+import os
+import json
+import shutil
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.preprocessing import (
+    load_and_clean_indicator, build_panel, aggregate_panel, load_hdi, write_panel_store,
+    HDI_PATH, PANEL_STORE_DIR
+)
+from src.scoring import normalize_indicators, criterion_matrix, apply_weights
+from src import instrumentation
+
+# Stage outputs are cached as <cache_dir>/<stage>/<input hash>.pkl
+PIPELINE_CACHE_DIR = os.path.join("data", "processed", "cache")
+KEEP_PER_STAGE = 20
+# Output schema version of each stage, part of its cache key: bump it whenever the
+# stage's code changes what it returns (columns, dtypes, values), so entries written
+# by older code are not served. Downstream keys embed upstream ones and follow.
+STAGE_VERSIONS = {
+    "clean": 2,       # 2: compact categorical / int16 keys
+    "panel": 2,
+    "hdi": 1,
+    "aggregate": 1,
+    "normalize": 1,
+    "score": 1
+}
+# Versioned, read-only builds the app memory-maps; CURRENT names the live one
+BUILDS_DIR = os.path.join("data", "processed", "builds")
+CURRENT_BUILD_FILE = "CURRENT"
+KEEP_BUILDS = 3
+# Forecast table columns published as arrays, and their file names in a build
+FORECAST_BANDS = {"prediction": "values", "lower": "lower", "upper": "upper"}
+
+def file_digest(path):
+    """
+    SHA-256 of a file's content.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def digest(*parts):
+    """
+    Hash of stage inputs: upstream keys, parameters and (small) DataFrames.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            h.update(json.dumps([str(c) for c in part.columns]).encode("utf-8"))
+            h.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+def stage_key(stage, *parts):
+    """
+    Cache key of a stage: its name and schema version plus the hashed inputs.
+    """
+    return digest(stage, STAGE_VERSIONS[stage], *parts)
+
+def _stage_path(stage, key, cache_dir):
+    return os.path.join(cache_dir, stage, f"{key}.pkl")
+
+def _store(stage, key, result, cache_dir):
+    path = _stage_path(stage, key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(result, tmp_path)
+    os.replace(tmp_path, path)
+
+    # Keep only the most recently used entries of each stage; other processes'
+    # in-flight *.tmp files are left alone (their os.replace would fail otherwise)
+    entries = sorted((e for e in os.scandir(os.path.dirname(path)) if e.name.endswith(".pkl")),
+                     key=lambda e: e.stat().st_mtime_ns)
+    for entry in entries[:-KEEP_PER_STAGE]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+def cached_stage(stage, key, compute, cache_dir=PIPELINE_CACHE_DIR, label=None):
+    """
+    Returns the cached output of `stage` for input hash `key`, computing it on a miss.
+    """
+    label = label or stage
+    path = _stage_path(stage, key, cache_dir)
+    with instrumentation.stage(f"pipeline.{label}"):
+        if os.path.exists(path):
+            os.utime(path)
+            print(f"⏭️  {label}: unchanged")
+            instrumentation.annotate(cache="hit")
+            return pd.read_pickle(path)
+
+        result = compute()
+        _store(stage, key, result, cache_dir)
+        print(f"⚙️  {label}: rebuilt")
+        instrumentation.annotate(cache="miss")
+        return result
+
+def _clean_stage(paths, keys, strategy, n_jobs, cache_dir):
+    """
+    Per-indicator cleaning; cache misses run in parallel.
+    """
+    indicators = list(paths)
+    missing = [ind for ind in indicators if not os.path.exists(_stage_path("clean", keys[ind], cache_dir))]
+
+    rebuilt = {}
+    if len(missing) > 1 and n_jobs != 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {ind: pool.submit(load_and_clean_indicator, paths[ind], ind, strategy) for ind in missing}
+            for ind, future in futures.items():
+                rebuilt[ind] = future.result()
+                _store("clean", keys[ind], rebuilt[ind], cache_dir)
+                print(f"⚙️  clean[{ind}]: rebuilt")
+
+    return [
+        rebuilt[ind] if ind in rebuilt else cached_stage(
+            "clean", keys[ind],
+            lambda ind=ind: load_and_clean_indicator(paths[ind], ind, strategy),
+            cache_dir, label=f"clean[{ind}]"
+        )
+        for ind in indicators
+    ]
+
+def _normalize(merged, context_df):
+    normalized = normalize_indicators(merged, context_df)
+    return normalized, criterion_matrix(normalized)
+
+def run_pipeline(indicators, context_df, weights, raw_path="data/raw", hdi_path=HDI_PATH,
+                 strategy="mean_median", aggregation="mean", n_jobs=None,
+                 cache_dir=PIPELINE_CACHE_DIR, store_dir=PANEL_STORE_DIR):
+    """
+    Runs clean → panel → HDI join → aggregate → normalize → score.
+
+    Each stage is keyed by a hash of its inputs and parameters and skipped when
+    unchanged, so e.g. new weights only re-run the scoring stage. The panel store
+    is re-exported only when the panel itself changed.
+
+    Returns:
+        dict with panel, hdi, merged, normalized, matrix and scored frames
+    """
+    indicators = list(indicators)
+    paths = {ind: os.path.join(raw_path, f"{ind}_worldbank.csv") for ind in indicators}
+    clean_keys = {ind: stage_key("clean", file_digest(paths[ind]), ind, strategy) for ind in indicators}
+
+    # Cleaned frames are only loaded (or rebuilt) when the panel itself is stale
+    panel_key = stage_key("panel", [clean_keys[ind] for ind in indicators])
+    panel = cached_stage(
+        "panel", panel_key,
+        lambda: build_panel(_clean_stage(paths, clean_keys, strategy, n_jobs, cache_dir)),
+        cache_dir
+    )
+
+    hdi_key = stage_key("hdi", file_digest(hdi_path), panel_key)
+    hdi_df = cached_stage(
+        "hdi", hdi_key,
+        lambda: load_hdi(path=hdi_path, country_codes=panel["country_code"].unique(),
+                         years=panel["date"].unique()),
+        cache_dir
+    )
+
+    merged_key = stage_key("aggregate", panel_key, hdi_key, aggregation)
+    merged = cached_stage(
+        "aggregate", merged_key,
+        lambda: pd.merge(aggregate_panel(panel, how=aggregation), hdi_df, on=["country_code", "date"], how="left"),
+        cache_dir
+    )
+
+    normalize_key = stage_key("normalize", merged_key, context_df)
+    normalized, matrix = cached_stage(
+        "normalize", normalize_key, lambda: _normalize(merged, context_df), cache_dir
+    )
+
+    score_key = stage_key("score", normalize_key, weights)
+    scored = cached_stage(
+        "score", score_key,
+        lambda: normalized.assign(relocation_score=apply_weights(matrix, weights).to_numpy()),
+        cache_dir
+    )
+
+    # Export the compiled panel for the app / forecasts only when it changed
+    marker = os.path.join(store_dir, "pipeline_key.txt")
+    exported = None
+    if os.path.exists(marker) and os.path.exists(os.path.join(store_dir, "meta.json")):
+        with open(marker, encoding="utf-8") as f:
+            exported = f.read()
+    if exported != panel_key:
+        write_panel_store(panel, indicators, store_dir=store_dir)
+        with open(marker, "w", encoding="utf-8") as f:
+            f.write(panel_key)
+        print("⚙️  export: panel store written")
+
+    return {
+        "panel": panel,
+        "hdi": hdi_df,
+        "merged": merged,
+        "normalized": normalized,
+        "matrix": matrix,
+        "scored": scored,
+        "keys": {"panel": panel_key, "normalize": normalize_key, "score": score_key}
+    }
+
+def _save_array(directory, name, values):
+    np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(values))
+
+def _forecast_arrays(forecasts, countries, indicators):
+    """
+    Long forecast table → ({column: country × indicator × horizon array} for the
+    prediction and its lower / upper band, first forecast year per series; -1 where
+    no forecast is stored).
+    """
+    columns = [column for column in FORECAST_BANDS if column in forecasts.columns]
+    horizon = int(forecasts.groupby(["country", "indicator"]).size().max()) if len(forecasts) else 0
+    arrays = {column: np.full((len(countries), len(indicators), horizon), np.nan) for column in columns}
+    start = np.full((len(countries), len(indicators)), -1, dtype=np.int32)
+    c_pos = {country: n for n, country in enumerate(countries)}
+    i_pos = {indicator: n for n, indicator in enumerate(indicators)}
+    for (country, indicator), rows in forecasts.groupby(["country", "indicator"], sort=False):
+        if country not in c_pos or indicator not in i_pos:
+            continue
+        rows = rows.sort_values("year")
+        for column in columns:
+            arrays[column][c_pos[country], i_pos[indicator], :len(rows)] = rows[column].to_numpy(dtype=float)
+        start[c_pos[country], i_pos[indicator]] = int(rows["year"].iloc[0])
+    return arrays, start
+
+def publish_build(result, panel, indicators, forecasts=None, cube=None, similarity=None, builds_dir=BUILDS_DIR):
+    """
+    Publishes what the app reads as a new versioned build: a directory of .npy
+    arrays (panel store, criterion matrix, forecasts, criterion cube, similarity
+    distances) plus manifest.json, written aside and then swapped in by
+    atomically rewriting the CURRENT pointer. Returns the build version.
+    """
+    matrix = result["matrix"]
+    version = digest(result["keys"]["normalize"], forecasts if forecasts is not None else None)[:16]
+    build_dir = os.path.join(builds_dir, version)
+
+    if not os.path.exists(os.path.join(build_dir, "manifest.json")):
+        tmp_dir = f"{build_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        panel_meta = write_panel_store(panel, indicators, store_dir=os.path.join(tmp_dir, "panel"))
+        _save_array(tmp_dir, "matrix", matrix.to_numpy(dtype=float))
+        manifest = {
+            "version": version,
+            "countries": [str(country) for country in matrix.index],
+            "criteria": list(matrix.columns),
+            "country_codes": dict(zip(panel_meta["country_names"], panel_meta["countries"]))
+        }
+        if forecasts is not None:
+            names = sorted(panel_meta["country_names"])
+            arrays, start = _forecast_arrays(forecasts, names, list(indicators))
+            for column, values in arrays.items():
+                _save_array(tmp_dir, f"forecast_{FORECAST_BANDS[column]}", values)
+            _save_array(tmp_dir, "forecast_start", start)
+            manifest["forecasts"] = {"countries": names, "indicators": list(indicators), "columns": list(arrays)}
+        if cube is not None:
+            cube_values, cube_countries, cube_years = cube
+            _save_array(tmp_dir, "cube", cube_values)
+            manifest["cube"] = {"countries": [str(c) for c in cube_countries], "years": [int(y) for y in cube_years]}
+        if similarity is not None:
+            _save_array(tmp_dir, "distances", similarity["distances"])
+            manifest["similarity"] = {"countries": [str(c) for c in similarity["countries"]],
+                                      "digests": similarity["digests"]}
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(tmp_dir, build_dir)
+        except OSError:
+            # Published concurrently by another process
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # Atomic swap: readers see either the old or the new version, never a mix
+    pointer = os.path.join(builds_dir, CURRENT_BUILD_FILE)
+    with open(f"{pointer}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{pointer}.{os.getpid()}.tmp", pointer)
+
+    # Older builds can go; processes still mapping them keep their pages (POSIX)
+    builds = sorted((e for e in os.scandir(builds_dir) if e.is_dir() and not e.name.endswith(".tmp")),
+                    key=lambda e: e.stat().st_mtime_ns)
+    for entry in [e for e in builds if e.name != version][:-KEEP_BUILDS or None]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+    return version
+
+def current_build_version(builds_dir=BUILDS_DIR):
+    """
+    Version the CURRENT pointer designates, or None if nothing was published yet.
+    """
+    try:
+        with open(os.path.join(builds_dir, CURRENT_BUILD_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def _load_array(directory, name):
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+def open_build(version, builds_dir=BUILDS_DIR):
+    """
+    Memory-maps a published build. Every array is read-only and backed by the
+    page cache, so all sessions and worker processes opening the same version
+    share one copy.
+
+    Returns:
+        dict with version, matrix (DataFrame view), countries, country_codes,
+        panel_dir, forecasts, cube and similarity (None when not published)
+    """
+    build_dir = os.path.join(builds_dir, version)
+    with open(os.path.join(build_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    matrix = pd.DataFrame(_load_array(build_dir, "matrix"), copy=False,
+                          index=pd.Index(manifest["countries"], name="country"), columns=manifest["criteria"])
+    build = {
+        "version": version,
+        "matrix": matrix,
+        "countries": sorted(manifest["country_codes"]),
+        "country_codes": manifest["country_codes"],
+        "panel_dir": os.path.join(build_dir, "panel"),
+        "forecasts": None,
+        "cube": None,
+        "similarity": None
+    }
+    if "forecasts" in manifest:
+        build["forecasts"] = {
+            **manifest["forecasts"],
+            **{column: _load_array(build_dir, f"forecast_{FORECAST_BANDS[column]}")
+               for column in manifest["forecasts"].get("columns", ["prediction"])},
+            "start": _load_array(build_dir, "forecast_start")
+        }
+    if "cube" in manifest:
+        build["cube"] = (_load_array(build_dir, "cube"), np.asarray(manifest["cube"]["countries"], dtype=object),
+                         np.asarray(manifest["cube"]["years"]))
+    if "similarity" in manifest:
+        build["similarity"] = {
+            "countries": np.asarray(manifest["similarity"]["countries"], dtype=object),
+            "criteria": manifest["criteria"],
+            "vectors": matrix.loc[manifest["similarity"]["countries"]].to_numpy(),
+            "digests": manifest["similarity"]["digests"],
+            "distances": _load_array(build_dir, "distances")
+        }
+    return build
+
+def published_forecast(forecasts, country, indicator, years_ahead):
+    """
+    Stored forecast of one series from a build (with its lower / upper band when
+    published), or None if it is not there (or shorter than `years_ahead`).
+    """
+    if forecasts is None or country not in forecasts["countries"] or indicator not in forecasts["indicators"]:
+        return None
+    c = forecasts["countries"].index(country)
+    i = forecasts["indicators"].index(indicator)
+    start = int(forecasts["start"][c, i])
+    values = forecasts["prediction"][c, i, :years_ahead]
+    if start < 0 or len(values) < years_ahead or np.isnan(values).any():
+        return None
+    pred_df = pd.DataFrame({"year": np.arange(start, start + years_ahead), "prediction": np.array(values)})
+    for column in ("lower", "upper"):
+        if column in forecasts:
+            pred_df[column] = np.array(forecasts[column][c, i, :years_ahead])
+    return pred_df
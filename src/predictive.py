@@ -1,12 +1,35 @@
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 
-def predict_linear_trend(df, country, indicator, years_ahead=20):
+from src.preprocessing import panel_to_cube
+from src.instrumentation import instrumented
+
+# Random Forest configuration used for trend forecasts
+RANDOM_FOREST_PARAMS = {"n_estimators": 100, "random_state": 42}
+
+# Forecast bands: central interval level, bootstrap replicates of the linear trend
+# (resampled BOOTSTRAP_BLOCK at a time), and countries × indicators per process-pool
+# task in forecast_intervals_batch. Together they bound each task's memory.
+INTERVAL_LEVEL = 0.9
+N_BOOTSTRAP = 500
+BOOTSTRAP_BLOCK = 50
+BOOTSTRAP_SEED = 42
+INTERVAL_CHUNK = 64
+INTERVAL_INDICATOR_CHUNK = 8
+
+def _interval_bounds(level):
+    return (1 - level) / 2, (1 + level) / 2
+
+@instrumented()
+def predict_linear_trend(df, country, indicator, years_ahead=20, intervals=False, level=INTERVAL_LEVEL):
     """
-    Predicts future trend using linear regression.
+    Predicts future trend using linear regression. With `intervals`, adds a
+    residual-bootstrap prediction interval (lower / upper columns).
     """
+    from sklearn.linear_model import LinearRegression
+
     country_df = df[df["country"] == country].sort_values("date")
     X = country_df["date"].values.reshape(-1, 1)
     y = country_df[indicator].values
@@ -21,24 +44,231 @@ def predict_linear_trend(df, country, indicator, years_ahead=20):
         "year": future_years.flatten(),
         "prediction": predictions
     })
+    if intervals:
+        lower, upper = bootstrap_linear_intervals(y.astype(float)[None, :, None], X.ravel(), years_ahead, level=level)
+        pred_df["lower"] = lower[0, 0]
+        pred_df["upper"] = upper[0, 0]
     return pred_df, model
 
-def predict_random_forest_trend(df, country, indicator, years_ahead=20):
+@instrumented()
+def predict_random_forest_trend(df, country, indicator, years_ahead=20, level=INTERVAL_LEVEL):
     """
-    Predicts future trend using Random Forest Regressor.
+    Predicts future trend using Random Forest Regressor. The lower / upper columns
+    are quantiles of the individual trees' predictions.
     """
+    from sklearn.ensemble import RandomForestRegressor
+
     country_df = df[df["country"] == country].sort_values("date")
     X = country_df["date"].values.reshape(-1, 1)
     y = country_df[indicator].values
 
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
+    model = RandomForestRegressor(**RANDOM_FOREST_PARAMS)
     model.fit(X, y)
 
     future_years = np.arange(X[-1][0] + 1, X[-1][0] + years_ahead + 1).reshape(-1, 1)
     predictions = model.predict(future_years)
+    per_tree = np.stack([tree.predict(future_years) for tree in model.estimators_])
+    lower, upper = np.quantile(per_tree, _interval_bounds(level), axis=0)
 
     pred_df = pd.DataFrame({
         "year": future_years.flatten(),
-        "prediction": predictions
+        "prediction": predictions,
+        "lower": lower,
+        "upper": upper
+    })
+    return pred_df, model
+
+def fit_linear_trends(cube, years):
+    """
+    Closed-form least squares y = a + b * year for every series of a
+    country × year × indicator array at once (missing values ignored).
+
+    Returns:
+        (intercept, slope, last observed year), each country × indicator
+    """
+    t = np.asarray(years, dtype=float)[None, :, None]
+    mask = ~np.isnan(cube)
+    n = mask.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_mean = np.where(mask, t, 0).sum(axis=1) / n
+        y_mean = np.where(mask, cube, 0).sum(axis=1) / n
+        dt = np.where(mask, t - t_mean[:, None, :], 0)
+        dy = np.where(mask, cube - y_mean[:, None, :], 0)
+        sxx = (dt * dt).sum(axis=1)
+        # A single observation gives a flat line, as LinearRegression does
+        slope = np.where(sxx > 0, (dt * dy).sum(axis=1) / np.where(sxx > 0, sxx, 1), 0.0)
+
+    intercept = y_mean - slope * t_mean
+    last_year = np.where(mask, t, -np.inf).max(axis=1)
+    return intercept, slope, last_year
+
+@instrumented()
+def forecast_linear_batch(df, indicators, years_ahead=20):
+    """
+    Linear-trend forecasts for every (country, indicator) series of a long panel in one pass.
+
+    Each series is extrapolated `years_ahead` years past its last observation.
+
+    Returns:
+        pd.DataFrame with columns: country, indicator, year, prediction
+    """
+    cube, countries, years = panel_to_cube(df, indicators)
+    intercept, slope, last_year = fit_linear_trends(cube, years)
+
+    fitted = np.isfinite(last_year)
+    c_idx, k_idx = np.nonzero(fitted)
+    steps = np.arange(1, years_ahead + 1)
+    future = last_year[c_idx, k_idx][:, None] + steps
+    predictions = intercept[c_idx, k_idx][:, None] + slope[c_idx, k_idx][:, None] * future
+
+    return pd.DataFrame({
+        "country": np.repeat(countries[c_idx], years_ahead),
+        "indicator": np.repeat(np.asarray(indicators, dtype=object)[k_idx], years_ahead),
+        "year": future.ravel().astype(int),
+        "prediction": predictions.ravel()
+    })
+
+# splitmix64 constants (golden-ratio increment and finalizer multipliers)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+def _mix64(x):
+    """
+    splitmix64 finalizer, in place: turns uint64 counters into well-spread random bits.
+    """
+    x ^= x >> np.uint64(30)
+    x *= _MIX1
+    x ^= x >> np.uint64(27)
+    x *= _MIX2
+    x ^= x >> np.uint64(31)
+    return x
+
+def _series_indices(keys, counters, n):
+    """
+    Uniform draws from range(n) of each series (n: country × indicator), shaped
+    replicate × country × draw × indicator, that depend only on each series' key
+    and the (replicate, draw) counters.
+    """
+    x = keys[None, :, None, :] + counters[:, None, :, None] * _GOLDEN
+    _mix64(x)
+    # Multiply-shift of the top 32 bits maps them onto [0, n) without a modulo
+    x >>= np.uint64(32)
+    x *= n.astype(np.uint64)[None, :, None, :]
+    x >>= np.uint64(32)
+    return x.view(np.int64)
+
+def bootstrap_linear_intervals(cube, years, years_ahead=20, n_boot=N_BOOTSTRAP, level=INTERVAL_LEVEL,
+                               seed=BOOTSTRAP_SEED, block=BOOTSTRAP_BLOCK, origin=(0, 0)):
+    """
+    Residual-bootstrap prediction intervals of the linear trend for every series
+    of a country × year × indicator array at once.
+
+    Each replicate adds resampled residuals (drawn within the series) to the fitted
+    line, refits it in closed form, and extrapolates with one more resampled residual
+    per future year. Replicates are fitted `block` at a time in batched
+    fit_linear_trends calls, so the temporaries scale with `block`, not `n_boot`;
+    only the n_boot × country × years_ahead × indicator forecast paths are kept.
+
+    Draws are counter-based, keyed by `seed`, the replicate and the series' position
+    (`origin` is the cube's offset in a larger country × indicator panel), so a series
+    gets the same band whether it is resampled alone, in a tile, or in one block.
+
+    Returns:
+        (lower, upper), each country × indicator × years_ahead, for the years following
+        each series' last observation (NaN for series without data)
+    """
+    cube = np.asarray(cube, dtype=float)
+    n_countries, n_years, n_indicators = cube.shape
+    t = np.asarray(years, dtype=float)
+    intercept, slope, last_year = fit_linear_trends(cube, years)
+
+    fitted = intercept[:, None, :] + slope[:, None, :] * t[None, :, None]
+    mask = ~np.isnan(cube)
+    n_obs = np.maximum(mask.sum(axis=1), 1)
+    # Raw residuals understate the noise by the two fitted parameters: rescale by sqrt(n / (n - 2))
+    inflation = np.sqrt(n_obs / np.maximum(n_obs - 2, 1))
+    residuals = np.where(mask, (cube - fitted) * inflation[:, None, :], np.nan)
+    # Observed residuals first along the year axis, so draw k of a series with n points is index k < n
+    order = np.argsort(~mask, axis=1, kind="stable")
+    packed = np.nan_to_num(np.take_along_axis(residuals, order, axis=1))
+
+    country_ids = np.arange(origin[0], origin[0] + n_countries, dtype=np.uint64)
+    indicator_ids = np.arange(origin[1], origin[1] + n_indicators, dtype=np.uint64)
+    keys = _mix64((country_ids[:, None] << np.uint64(32) | indicator_ids[None, :])
+                  ^ _mix64(np.full(1, seed, dtype=np.uint64)))
+
+    def draw(start, n_reps, n_draws, stream):
+        # Counter: replicate and stream (0 in-sample, 1 future) in the high bits, draw in the low bits
+        reps = np.arange(start, start + n_reps, dtype=np.uint64) * np.uint64(2) + np.uint64(stream)
+        counters = reps[:, None] << np.uint64(32) | np.arange(n_draws, dtype=np.uint64)[None, :]
+        idx = _series_indices(keys, counters, n_obs)
+        # Gather through flat per-series offsets instead of broadcasting `packed` per replicate
+        idx *= n_indicators
+        idx += (np.arange(n_countries)[:, None, None] * n_years * n_indicators
+                + np.arange(n_indicators)[None, None, :])
+        return packed.ravel()[idx]
+
+    future = last_year[:, None, :] + np.arange(1, years_ahead + 1)[None, :, None]
+    paths = np.empty((n_boot, n_countries, years_ahead, n_indicators))
+    for start in range(0, n_boot, block):
+        n_reps = min(block, n_boot - start)
+        replicates = np.where(mask, fitted + draw(start, n_reps, n_years, 0), np.nan)
+        b_intercept, b_slope, _ = fit_linear_trends(replicates.reshape(-1, n_years, n_indicators), years)
+        del replicates
+        b_intercept = b_intercept.reshape(n_reps, n_countries, 1, n_indicators)
+        b_slope = b_slope.reshape(n_reps, n_countries, 1, n_indicators)
+        with np.errstate(invalid="ignore"):
+            paths[start:start + n_reps] = b_intercept + b_slope * future + draw(start, n_reps, years_ahead, 1)
+
+    lower, upper = np.quantile(paths, _interval_bounds(level), axis=0)
+    return lower.transpose(0, 2, 1), upper.transpose(0, 2, 1)
+
+def _intervals_worker(cube, years, years_ahead, n_boot, level, seed, origin):
+    return bootstrap_linear_intervals(cube, years, years_ahead, n_boot, level, seed, origin=origin)
+
+@instrumented()
+def forecast_intervals_batch(df, indicators, years_ahead=20, n_boot=N_BOOTSTRAP, level=INTERVAL_LEVEL,
+                             n_jobs=None, chunk_size=INTERVAL_CHUNK, indicator_chunk_size=INTERVAL_INDICATOR_CHUNK,
+                             seed=BOOTSTRAP_SEED):
+    """
+    Residual-bootstrap bands for every (country, indicator) linear-trend forecast of
+    a long panel (same rows as forecast_linear_batch). The cube is tiled into
+    `chunk_size` countries × `indicator_chunk_size` indicators, which are resampled
+    across a process pool, so a task's memory does not grow with the panel. Draws
+    are keyed by `seed` and each series' position in the panel, so results depend
+    neither on `n_jobs` nor on the tile sizes.
+
+    Returns:
+        pd.DataFrame with columns: country, indicator, year, lower, upper
+    """
+    cube, countries, years = panel_to_cube(df, indicators)
+    _, _, last_year = fit_linear_trends(cube, years)
+
+    lower = np.full((len(countries), len(indicators), years_ahead), np.nan)
+    upper = np.full_like(lower, np.nan)
+    tiles = [(c, k) for c in range(0, len(countries), chunk_size)
+             for k in range(0, len(indicators), indicator_chunk_size)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = {
+            pool.submit(_intervals_worker, cube[c:c + chunk_size, :, k:k + indicator_chunk_size], years,
+                        years_ahead, n_boot, level, seed, (c, k)): (c, k)
+            for c, k in tiles
+        }
+        for future, (c, k) in futures.items():
+            low, high = future.result()
+            lower[c:c + chunk_size, k:k + indicator_chunk_size] = low
+            upper[c:c + chunk_size, k:k + indicator_chunk_size] = high
+
+    fitted = np.isfinite(last_year)
+    c_idx, k_idx = np.nonzero(fitted)
+    future = last_year[c_idx, k_idx][:, None] + np.arange(1, years_ahead + 1)
+
+    return pd.DataFrame({
+        "country": np.repeat(countries[c_idx], years_ahead),
+        "indicator": np.repeat(np.asarray(indicators, dtype=object)[k_idx], years_ahead),
+        "year": future.ravel().astype(int),
+        "lower": lower[c_idx, k_idx].ravel(),
+        "upper": upper[c_idx, k_idx].ravel()
     })
-    return pred_df, model
\ No newline at end of file
@@ -1,19 +1,149 @@
 # src/preprocessing.py
 
+import os
+import json
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
 
-def load_and_clean_indicator(path, indicator_name):
+from src.instrumentation import instrumented, annotate
+
+# Compiled panel store: country × year × indicator array + metadata
+PANEL_STORE_DIR = os.path.join("data", "processed", "panel")
+
+# HDI source and its filtered, code-keyed cache
+HDI_PATH = os.path.join("data", "external", "hdi_historical.csv")
+HDI_CACHE_PATH = os.path.join("data", "processed", "hdi_tracked.pkl")
+
+# Compact panel schema: countries as categoricals (integer codes + one shared
+# dictionary), years as small ints; values stay float64 unless float32 is requested
+PANEL_KEYS = ["country", "country_code", "date"]
+YEAR_DTYPE = "int16"
+VALUE_DTYPES = ("float64", "float32")
+
+# Gap-filling strategies accepted by impute_indicators
+IMPUTATION_STRATEGIES = ("mean_median", "interpolate", "ffill")
+
+def _interpolate_within_groups(values, time, groups):
+    """
+    Linear interpolation along `time` inside each group, for all columns at once.
+    Leading/trailing gaps are left missing.
+    """
+    t = time.to_numpy(dtype=float)
+    known_time = pd.DataFrame(
+        np.where(values.notna(), t[:, None], np.nan),
+        index=values.index, columns=values.columns
+    )
+    prev_v = values.groupby(groups, observed=True).ffill()
+    next_v = values.groupby(groups, observed=True).bfill()
+    prev_t = known_time.groupby(groups, observed=True).ffill()
+    next_t = known_time.groupby(groups, observed=True).bfill()
+
+    frac = prev_t.rsub(t, axis=0) / (next_t - prev_t)
+    return values.fillna(prev_v + (next_v - prev_v) * frac)
+
+@instrumented()
+def impute_indicators(df, columns, strategy="mean_median", group_col="country", time_col="date", present=None):
+    """
+    Fills gaps in several indicator columns at once using built-in grouped operations.
+
+    Strategies:
+        mean_median: country mean (the default, as before)
+        interpolate: linear interpolation along time within each country
+        ffill: last observed value carried forward within each country
+    Whatever remains missing falls back to the global yearly median.
+
+    `present` (boolean, rows × columns) marks the cells that exist in each
+    indicator's source; the others stay missing and are left out of the median.
+    """
+    if strategy not in IMPUTATION_STRATEGIES:
+        raise ValueError(f"Unknown imputation strategy: {strategy}")
+
+    columns = list(columns)
+    df = df.copy()
+
+    if strategy == "mean_median":
+        df[columns] = df[columns].fillna(df.groupby(group_col, observed=True)[columns].transform("mean"))
+    else:
+        ordered = df.sort_values([group_col, time_col], kind="stable")
+        groups = ordered[group_col]
+        if strategy == "ffill":
+            filled = ordered[columns].groupby(groups, observed=True).ffill()
+        else:
+            filled = _interpolate_within_groups(ordered[columns], ordered[time_col], groups)
+        df[columns] = filled.reindex(df.index)
+
+    if present is not None:
+        df[columns] = df[columns].where(present)
+
+    # If NaNs remain → use global yearly median
+    df[columns] = df[columns].fillna(df.groupby(time_col)[columns].transform("median"))
+    if present is not None:
+        df[columns] = df[columns].where(present)
+    return df
+
+def compact_panel(df, value_dtype=None):
+    """
+    Converts a long frame to the compact schema: `country` and `country_code` as
+    categoricals with lexically sorted categories (so sorting and grouping behave
+    as with strings), `date` as int16 and, optionally, indicator values as float32.
+    """
+    if value_dtype is not None and value_dtype not in VALUE_DTYPES:
+        raise ValueError(f"Unknown value dtype: {value_dtype}")
+
+    df = df.copy()
+    for column in ("country", "country_code"):
+        if column in df and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = pd.Categorical(df[column], categories=np.sort(df[column].dropna().unique()))
+    if "date" in df:
+        df["date"] = df["date"].astype(YEAR_DTYPE)
+    if value_dtype is not None:
+        values = [c for c in df.columns if c not in PANEL_KEYS and pd.api.types.is_float_dtype(df[c])]
+        df[values] = df[values].astype(value_dtype)
+    return df
+
+@instrumented()
+def load_and_clean_indicator(path, indicator_name, strategy="mean_median", value_dtype=None):
     df = pd.read_csv(path)
     df["date"] = pd.to_numeric(df["date"], errors="coerce")
+    df = df.dropna(subset=["date"])
     df = df.rename(columns={"value": indicator_name})
-    
-    # Imputation using country-level mean
-    df[indicator_name] = df.groupby("country")[indicator_name].transform(lambda x: x.fillna(x.mean()))
-    # If NaNs remain → use global yearly median
-    df[indicator_name] = df.groupby("date")[indicator_name].transform(lambda x: x.fillna(x.median()))
-    
-    return df.dropna(subset=[indicator_name])
+
+    df = impute_indicators(df, [indicator_name], strategy=strategy)
+
+    return compact_panel(df.dropna(subset=[indicator_name]), value_dtype)
+
+@instrumented()
+def load_and_clean_indicators(indicators, raw_path="data/raw", strategy="mean_median", value_dtype=None):
+    """
+    Loads several raw indicator CSVs into one wide frame (country, country_code,
+    date, <indicators...>) and imputes all of them in a single pass.
+
+    Each indicator is only filled on the rows present in its own CSV, so the result
+    matches running load_and_clean_indicator per indicator and outer-merging.
+    """
+    raw = pd.concat(
+        [
+            pd.read_csv(os.path.join(raw_path, f"{ind}_worldbank.csv")).assign(indicator=ind)
+            for ind in indicators
+        ],
+        ignore_index=True
+    )
+    raw["date"] = pd.to_numeric(raw["date"], errors="coerce")
+    raw = raw.dropna(subset=["date"])
+    raw["date"] = raw["date"].astype(int)
+    raw["present"] = True
+
+    wide = raw.set_index(["country_code", "date", "indicator"])[["value", "present"]].unstack("indicator")
+    values = wide["value"].reindex(columns=list(indicators))
+    present = wide["present"].reindex(columns=list(indicators)).notna()
+
+    names = raw.drop_duplicates("country_code").set_index("country_code")["country"]
+    df = values.reset_index()
+    df.columns.name = None
+    df.insert(0, "country", df["country_code"].map(names))
+
+    df = impute_indicators(df, indicators, strategy=strategy, present=present.to_numpy())
+    return compact_panel(df.dropna(subset=list(indicators), how="all").reset_index(drop=True), value_dtype)
 
 def get_common_year(dfs):
     common_years = set(dfs[0]["date"].unique())
@@ -21,17 +151,202 @@ def get_common_year(dfs):
         common_years &= set(df["date"].unique())
     return max(common_years) if common_years else None
 
-def aggregate_historical(dfs):
+# Per-country aggregations accepted by aggregate_panel
+AGGREGATIONS = ("mean", "latest", "recent")
+
+@instrumented()
+def build_panel(dfs):
+    """
+    Aligns cleaned indicator frames on (country, country_code, date) in a single
+    multi-way join, equivalent to chaining outer merges.
+
+    Returns:
+        long panel with columns country, country_code, date, <indicators...>
+    """
+    panel = pd.concat([df.set_index(PANEL_KEYS) for df in dfs], axis=1, join="outer")
+    return panel.sort_index().reset_index()
+
+@instrumented()
+def aggregate_panel(panel, how="mean", n_years=5):
+    """
+    Collapses the long panel to one row per country.
+
+    how:
+        mean: average over all years (the historical behaviour)
+        latest: most recent non-missing value of each indicator
+        recent: average over each country's last `n_years` years
+    """
+    if how not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation: {how}")
+
+    keys = ["country", "country_code"]
+    if how == "recent":
+        last_year = panel.groupby(keys, observed=True)["date"].transform("max")
+        panel = panel[panel["date"] > last_year - n_years]
+    if how == "latest":
+        return panel.sort_values("date", kind="stable").groupby(keys, as_index=False, observed=True).last()
+    return panel.groupby(keys, as_index=False, observed=True).mean(numeric_only=True)
+
+def panel_to_cube(panel, columns, index_col="country"):
+    """
+    Reshapes a long panel into a dense index × year × column array (missing → NaN).
+
+    Returns:
+        (cube, index values, years)
+    """
+    index = np.sort(panel[index_col].unique())
+    years = np.sort(panel["date"].unique())
+    full = pd.MultiIndex.from_product([index, years], names=[index_col, "date"])
+    cube = panel.set_index([index_col, "date"])[list(columns)].reindex(full).to_numpy(dtype=float)
+    return cube.reshape(len(index), len(years), len(columns)), index, years
+
+def aggregate_historical(dfs, how="mean", n_years=5):
     """
     Merges and averages multiple indicators per country over time.
     """
-    from functools import reduce
+    return aggregate_panel(build_panel(dfs), how=how, n_years=n_years)
 
-    df_merged = reduce(
-        lambda l, r: pd.merge(l, r, on=["country", "country_code", "date"], how="outer"),
-        dfs
-    )
 
-    # Take the average of each indicator per country
-    df_avg = df_merged.groupby(["country", "country_code"], as_index=False).mean(numeric_only=True)
-    return df_avg
\ No newline at end of file
+@instrumented()
+def load_hdi(path=HDI_PATH, country_codes=None, years=None, cache_path=HDI_CACHE_PATH):
+    """
+    Loads HDI keyed by ISO3 code (country_code, date, hdi), keeping only the
+    tracked countries and years.
+
+    The filtered frame is cached in `cache_path` and only rebuilt when the source
+    file (mtime/size) or the requested countries/years change.
+    """
+    stat = os.stat(path)
+    key = {
+        "source": [os.path.abspath(path), stat.st_mtime_ns, stat.st_size],
+        "countries": sorted(country_codes) if country_codes is not None else None,
+        "years": sorted(int(y) for y in years) if years is not None else None
+    }
+
+    if os.path.exists(cache_path):
+        cached = pd.read_pickle(cache_path)
+        if cached["key"] == key:
+            annotate(cache="hit")
+            return cached["hdi"]
+
+    annotate(cache="miss")
+    hdi = pd.read_csv(path, usecols=["Code", "Year", "Human Development Index"])
+    hdi = hdi.rename(columns={
+        "Code": "country_code",
+        "Year": "date",
+        "Human Development Index": "hdi"
+    })
+    # Regional aggregates have no ISO3 code
+    hdi = hdi.dropna(subset=["country_code"])
+    if key["countries"] is not None:
+        hdi = hdi[hdi["country_code"].isin(key["countries"])]
+    if key["years"] is not None:
+        hdi = hdi[hdi["date"].isin(key["years"])]
+    hdi = hdi.astype({"date": int, "hdi": float}).reset_index(drop=True)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    pd.to_pickle({"key": key, "hdi": hdi}, cache_path)
+    return hdi
+
+@instrumented()
+def build_panel_store(indicators, raw_path="data/raw", store_dir=PANEL_STORE_DIR, strategy="mean_median"):
+    """
+    Cleans all raw indicator CSVs in one pass and compiles them into a single
+    country × year × indicator float64 array (`values.npy`) plus `meta.json`.
+    """
+    indicators = list(indicators)
+    df = load_and_clean_indicators(indicators, raw_path=raw_path, strategy=strategy)
+    return write_panel_store(df, indicators, store_dir=store_dir)
+
+def write_panel_store(df, indicators, store_dir=PANEL_STORE_DIR):
+    """
+    Writes an already cleaned long panel (country, country_code, date, <indicators...>)
+    to the panel store.
+    """
+    indicators = list(indicators)
+    names = df[["country_code", "country"]].drop_duplicates("country_code").sort_values("country_code")
+    codes = names["country_code"].tolist()
+    years = sorted(int(y) for y in df["date"].unique())
+
+    values = np.full((len(codes), len(years), len(indicators)), np.nan)
+    i = pd.Index(codes).get_indexer(df["country_code"])
+    j = pd.Index(years).get_indexer(df["date"].astype(int))
+    values[i, j, :] = df[indicators].to_numpy(dtype=float)
+
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(os.path.join(store_dir, "values.npy"), values)
+    meta = {
+        "countries": codes,
+        "country_names": names["country"].tolist(),
+        "years": years,
+        "indicators": list(indicators)
+    }
+    with open(os.path.join(store_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def open_panel_store(store_dir=PANEL_STORE_DIR):
+    """
+    Memory-maps the compiled panel without reading it into memory.
+
+    Returns:
+        (values, meta) where values is a read-only country × year × indicator array
+    """
+    with open(os.path.join(store_dir, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    values = np.load(os.path.join(store_dir, "values.npy"), mmap_mode="r")
+    return values, meta
+
+
+def panel_store_version(store_dir=PANEL_STORE_DIR):
+    """
+    Cheap identifier of the compiled panel (changes whenever the store is rewritten).
+    """
+    stat = os.stat(os.path.join(store_dir, "values.npy"))
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+@instrumented()
+def load_panel(store_dir=PANEL_STORE_DIR, indicators=None, countries=None, value_dtype=None):
+    """
+    Loads the panel (or a subset of indicators / country codes) as a long frame
+    with columns country, country_code, date, <indicators...> in the compact
+    schema (see compact_panel).
+
+    Rows where every selected indicator is missing are dropped, which matches an
+    outer merge of the cleaned per-indicator frames.
+    """
+    values, meta = open_panel_store(store_dir)
+    indicators = list(indicators) if indicators is not None else meta["indicators"]
+    codes = meta["countries"]
+    names = meta["country_names"]
+
+    k = [meta["indicators"].index(ind) for ind in indicators]
+    i = list(range(len(codes)))
+    if countries is not None:
+        wanted = set(countries)
+        i = [n for n, code in enumerate(codes) if code in wanted]
+
+    # Only the selected slices are paged in from the memory-mapped file
+    block = values[np.ix_(i, range(len(meta["years"])), k)]
+    n_countries, n_years = block.shape[:2]
+
+    # Countries are integer-coded against the store's dictionary; no per-row strings
+    name_order = np.argsort(names)
+    name_codes = np.empty(len(names), dtype=int)
+    name_codes[name_order] = np.arange(len(names))
+    code_order = np.argsort(codes)
+    code_codes = np.empty(len(codes), dtype=int)
+    code_codes[code_order] = np.arange(len(codes))
+
+    df = pd.DataFrame(block.reshape(n_countries * n_years, len(k)).astype(value_dtype or "float64"),
+                      columns=indicators)
+    df.insert(0, "date", np.tile(np.asarray(meta["years"], dtype=YEAR_DTYPE), n_countries))
+    df.insert(0, "country_code", pd.Categorical.from_codes(
+        np.repeat(code_codes[i], n_years), categories=np.asarray(codes, dtype=object)[code_order]))
+    df.insert(0, "country", pd.Categorical.from_codes(
+        np.repeat(name_codes[i], n_years), categories=np.asarray(names, dtype=object)[name_order]))
+
+    df = df.dropna(subset=indicators, how="all")
+    return df.sort_values(["country", "date"]).reset_index(drop=True)
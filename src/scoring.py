@@ -1,29 +1,238 @@
 # src/scoring.py
 
+import json
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
 
-def compute_relocation_score(df, context_df, weights):
+from src.preprocessing import panel_to_cube
+from src.instrumentation import instrumented, annotate
+
+# Weight key → (normalized column, inverted so that higher is better)
+CRITERIA = {
+    "gdp": ("gdp_per_capita", False),
+    "gini": ("gini_index_inverted", False),
+    "education": ("education_spending_gdp", False),
+    "maternity": ("maternity_score", False),
+    "employment": ("unemployment", True),
+    "stability": ("inflation", True),
+    "hdi": ("hdi", False)
+}
+
+# Weight key → (raw indicator column, inverted so that higher is better)
+RAW_CRITERIA = {
+    "gdp": ("gdp_per_capita", False),
+    "gini": ("gini_index", True),
+    "education": ("education_spending_gdp", False),
+    "maternity": ("maternity_score", False),
+    "employment": ("unemployment", True),
+    "stability": ("inflation", True),
+    "hdi": ("hdi", False)
+}
+
+def normalize_criterion_array(raw, country_axis=-2):
+    """
+    Vectorized equivalent of normalize_indicators + criterion_matrix for stacked data.
+
+    `raw` holds raw indicator values with the last axis in RAW_CRITERIA order and
+    countries along `country_axis`; any leading axes (samples, years, ...) are
+    normalized independently. Missing values are ignored when fitting, as MinMaxScaler does.
+    """
+    lo = np.nanmin(raw, axis=country_axis, keepdims=True)
+    hi = np.nanmax(raw, axis=country_axis, keepdims=True)
+    span = hi - lo
+    scaled = (raw - lo) / np.where(span == 0, 1, span)
+
+    inverted = np.array([inv for _, inv in RAW_CRITERIA.values()])
+    return np.where(inverted, 1 - scaled, scaled)
+
+@instrumented()
+def normalize_indicators(df, context_df):
+    """
+    Weight-independent step: merges context data and min-max normalizes every indicator.
+    """
+    # Imported here so that scoring (and the app's first paint) does not pay for sklearn
+    from sklearn.preprocessing import MinMaxScaler
+
     df = df.merge(context_df, on="country", how="inner")
-    
+
     # Invert gini
     df["gini_index_inverted"] = 1 - MinMaxScaler().fit_transform(df[["gini_index"]])
-    
+
     # Normalize the rest
     to_normalize = [
         "gdp_per_capita", "education_spending_gdp",
         "unemployment", "inflation", "maternity_score", "hdi"
     ]
     df[to_normalize] = MinMaxScaler().fit_transform(df[to_normalize])
-    
-    df["relocation_score"] = (
-        weights["gdp"] * df["gdp_per_capita"] +
-        weights["gini"] * df["gini_index_inverted"] +
-        weights["education"] * df["education_spending_gdp"] +
-        weights["maternity"] * df["maternity_score"] +
-        weights["employment"] * (1 - df["unemployment"]) +
-        weights["stability"] * (1 - df["inflation"]) + 
-        weights["hdi"] * df["hdi"]
-    )
-    
-    return df
\ No newline at end of file
+
+    return df
+
+def criterion_matrix(normalized_df):
+    """
+    Country × criterion matrix (columns in CRITERIA order), oriented so higher is better.
+    """
+    matrix = pd.DataFrame(index=normalized_df["country"].to_numpy())
+    matrix.index.name = "country"
+    for key, (column, inverted) in CRITERIA.items():
+        values = normalized_df[column].to_numpy(dtype=float)
+        matrix[key] = 1 - values if inverted else values
+    return matrix
+
+@instrumented()
+def apply_weights(matrix, weights):
+    """
+    Scores every country with a single dot product against the criterion matrix.
+    """
+    w = np.array([weights[key] for key in matrix.columns], dtype=float)
+    return pd.Series(matrix.to_numpy() @ w, index=matrix.index, name="relocation_score")
+
+@instrumented()
+def compute_relocation_score(df, context_df, weights):
+    df = normalize_indicators(df, context_df)
+    df["relocation_score"] = apply_weights(criterion_matrix(df), weights).to_numpy()
+    return df
+
+def weights_to_array(profiles):
+    """
+    Converts weight dicts into an N × K array in CRITERIA order (missing criteria weigh 0).
+    """
+    return np.array([[p.get(key, 0.0) for key in CRITERIA] for p in profiles], dtype=float)
+
+@instrumented()
+def score_profiles(matrix, weight_matrix, top_k=3):
+    """
+    Scores many weight profiles at once.
+
+    Args:
+        matrix: country × criterion matrix from criterion_matrix
+        weight_matrix: N × K array (columns in CRITERIA order)
+
+    Returns:
+        (scores, top) — N × countries score array and N × top_k country indices, best first
+    """
+    scores = np.asarray(weight_matrix, dtype=float) @ matrix.to_numpy().T
+    top_k = min(top_k, scores.shape[1])
+    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return scores, np.take_along_axis(top, order, axis=1)
+
+def _read_profiles(path, chunk_size):
+    """
+    Yields lists of (profile_id, weights) from a JSONL file, `chunk_size` at a time.
+    Each line is either {"id": ..., "weights": {...}} or a flat {"id": ..., "gdp": ..., ...}.
+    """
+    chunk = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            profile_id = record.pop("id", n)
+            chunk.append((profile_id, record.get("weights", record)))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+@instrumented()
+def score_profiles_file(matrix, profiles_path, output_path, top_k=3, chunk_size=10000):
+    """
+    Streams a JSONL file of weight profiles through score_profiles and writes the
+    top-k countries per profile to CSV (profile_id, rank, country, relocation_score).
+    Memory stays bounded by `chunk_size` regardless of the number of profiles.
+    """
+    countries = matrix.index.to_numpy()
+    n_profiles = 0
+    header = True
+    for chunk in _read_profiles(profiles_path, chunk_size):
+        ids = [profile_id for profile_id, _ in chunk]
+        scores, top = score_profiles(matrix, weights_to_array([w for _, w in chunk]), top_k)
+
+        k = top.shape[1]
+        pd.DataFrame({
+            "profile_id": np.repeat(ids, k),
+            "rank": np.tile(np.arange(1, k + 1), len(ids)),
+            "country": countries[top].ravel(),
+            "relocation_score": np.take_along_axis(scores, top, axis=1).ravel()
+        }).to_csv(output_path, mode="w" if header else "a", header=header, index=False)
+
+        header = False
+        n_profiles += len(ids)
+    annotate(rows=n_profiles)
+    return n_profiles
+
+# --------------------------
+# Temporal scoring over the country × year × criterion cube
+# --------------------------
+def criterion_cube(panel, context_df):
+    """
+    Raw criterion values per country and year (last axis in RAW_CRITERIA order).
+
+    `panel` is the long country × year frame with every raw indicator and `hdi`.
+
+    Returns:
+        (cube, countries, years)
+    """
+    panel = panel.merge(context_df, on="country", how="inner")
+    return panel_to_cube(panel, [column for column, _ in RAW_CRITERIA.values()])
+
+def rolling_cube(cube, window=1):
+    """
+    Trailing `window`-year mean along the year axis, ignoring missing values.
+    """
+    if window <= 1:
+        return cube
+    observed = ~np.isnan(cube)
+    sums = np.cumsum(np.where(observed, cube, 0.0), axis=1)
+    counts = np.cumsum(observed, axis=1)
+    sums[:, window:] -= sums[:, :-window].copy()
+    counts[:, window:] -= counts[:, :-window].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / np.where(counts == 0, np.nan, counts)
+
+def recency_weighted_cube(cube, years, half_life=5.0):
+    """
+    Collapses the year axis with weights halving every `half_life` years back from
+    the latest year (missing values ignored). Returns a country × criterion array.
+    """
+    years = np.asarray(years, dtype=float)
+    year_weights = 0.5 ** ((years.max() - years) / half_life)
+    observed = ~np.isnan(cube)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (np.einsum("y,cyk->ck", year_weights, np.where(observed, cube, 0.0))
+                / np.einsum("y,cyk->ck", year_weights, observed.astype(float)))
+
+@instrumented()
+def score_cube(cube, weights, window=1):
+    """
+    Normalizes every year across countries and scores it, all years in one pass.
+
+    Returns:
+        year × country score array (NaN where a criterion is missing that year)
+    """
+    w = np.array([weights.get(key, 0.0) for key in CRITERIA], dtype=float)
+    by_year = np.swapaxes(rolling_cube(cube, window), 0, 1)  # year × country × criterion
+    return normalize_criterion_array(by_year) @ w
+
+def recency_scores(cube, years, weights, half_life=5.0):
+    """
+    One score per country from recency-weighted criterion values.
+    """
+    w = np.array([weights.get(key, 0.0) for key in CRITERIA], dtype=float)
+    return normalize_criterion_array(recency_weighted_cube(cube, years, half_life)) @ w
+
+@instrumented()
+def rank_trajectories(cube, countries, years, weights, window=1):
+    """
+    Per-year scores and ranks (1 = best, missing scores unranked) as a long frame:
+    country, year, relocation_score, rank.
+    """
+    scores = score_cube(cube, weights, window)
+    ranks = pd.DataFrame(scores).rank(axis=1, ascending=False, method="min").to_numpy()
+    return pd.DataFrame({
+        "country": np.tile(countries, len(years)),
+        "year": np.repeat(np.asarray(years, dtype=int), len(countries)),
+        "relocation_score": scores.ravel(),
+        "rank": pd.array(ranks.ravel(), dtype="Int64")
+    })
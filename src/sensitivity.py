@@ -0,0 +1,111 @@
+# src/sensitivity.py
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from src.preprocessing import panel_to_cube
+from src.scoring import CRITERIA, RAW_CRITERIA, normalize_criterion_array
+from src.instrumentation import instrumented
+
+def sample_weights(weights, n_samples, concentration=50.0, seed=None):
+    """
+    Draws weight vectors around a profile from a Dirichlet distribution.
+
+    Higher `concentration` keeps samples closer to the profile. Returns an
+    n_samples × K array in CRITERIA order (rows sum to 1).
+    """
+    w = np.array([weights.get(key, 0.0) for key in CRITERIA], dtype=float)
+    alpha = concentration * w / w.sum() + 1e-3
+    return np.random.default_rng(seed).dirichlet(alpha, size=n_samples)
+
+def rank_counts(scores):
+    """
+    scores: samples × countries. Returns a countries × ranks count matrix (rank 0 = best).
+    """
+    n_countries = scores.shape[1]
+    # Missing scores rank last
+    ranks = np.argsort(np.argsort(-np.nan_to_num(scores, nan=-np.inf), axis=1, kind="stable"), axis=1)
+    flat = np.arange(n_countries)[None, :] * n_countries + ranks
+    return np.bincount(flat.ravel(), minlength=n_countries * n_countries).reshape(n_countries, n_countries)
+
+def summarize_ranks(counts, countries, top_k=3):
+    """
+    Turns rank counts into a per-country table: mean rank, P(top-k) and P(rank = r).
+    """
+    probs = counts / counts.sum(axis=1, keepdims=True)
+    ranks = np.arange(1, counts.shape[1] + 1)
+    summary = pd.DataFrame(probs, index=pd.Index(countries, name="country"),
+                           columns=[f"p_rank_{r}" for r in ranks])
+    summary.insert(0, f"p_top_{top_k}", probs[:, :top_k].sum(axis=1))
+    summary.insert(0, "mean_rank", probs @ ranks)
+    return summary.sort_values("mean_rank")
+
+def _weight_worker(matrix_values, weights, n_samples, concentration, seed, chunk_size):
+    counts = 0
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_samples, chunk_size):
+        n = min(chunk_size, n_samples - start)
+        samples = sample_weights(weights, n, concentration, seed=rng)
+        counts = counts + rank_counts(samples @ matrix_values.T)
+    return counts
+
+@instrumented()
+def weight_sensitivity(matrix, weights, n_samples=100_000, concentration=50.0, top_k=3,
+                       seed=None, n_jobs=1, chunk_size=20_000):
+    """
+    Monte Carlo over weights: how often each country lands at each rank when the
+    profile is perturbed. Samples are scored in vectorized chunks and optionally
+    spread over `n_jobs` processes.
+    """
+    values = matrix.to_numpy()
+    seeds = np.random.SeedSequence(seed).spawn(max(n_jobs, 1))
+    shares = [n_samples // len(seeds) + (i < n_samples % len(seeds)) for i in range(len(seeds))]
+
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [
+                pool.submit(_weight_worker, values, weights, n, concentration, s, chunk_size)
+                for n, s in zip(shares, seeds)
+            ]
+            counts = sum(f.result() for f in futures)
+    else:
+        counts = _weight_worker(values, weights, n_samples, concentration, seeds[0], chunk_size)
+
+    return summarize_ranks(counts, matrix.index, top_k)
+
+@instrumented()
+def year_bootstrap(panel, context_df, weights, n_samples=1000, top_k=3, seed=None, chunk_size=5000):
+    """
+    Bootstraps the years that feed the historical average.
+
+    `panel` is the long country × year frame with every raw criterion column
+    (including `hdi`). Each sample redraws the years with replacement, averages,
+    normalizes and scores all countries, entirely with array operations.
+    """
+    panel = panel.merge(context_df, on="country", how="inner")
+    columns = [column for column, _ in RAW_CRITERIA.values()]
+
+    # country × year × criterion
+    cube, countries, years = panel_to_cube(panel, columns)
+    observed = ~np.isnan(cube)
+    filled = np.where(observed, cube, 0.0)
+    observed = observed.astype(float)
+
+    w = np.array([weights[key] for key in CRITERIA], dtype=float)
+    rng = np.random.default_rng(seed)
+    counts = 0
+    for start in range(0, n_samples, chunk_size):
+        n = min(chunk_size, n_samples - start)
+        draws = rng.integers(0, len(years), size=(n, len(years)))
+        offsets = draws + np.arange(n)[:, None] * len(years)
+        year_weights = np.bincount(offsets.ravel(), minlength=n * len(years)).reshape(n, len(years))
+
+        # Weighted mean over the drawn years, ignoring missing values: samples × country × criterion
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (np.einsum("by,cyk->bck", year_weights, filled)
+                     / np.einsum("by,cyk->bck", year_weights, observed))
+
+        counts = counts + rank_counts(normalize_criterion_array(means) @ w)
+
+    return summarize_ranks(counts, countries, top_k)
@@ -0,0 +1,138 @@
+# src/similarity.py
+
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from src.scoring import CRITERIA
+from src.instrumentation import instrumented, annotate
+
+# Persisted index, refreshed in place by main.py whenever the criterion matrix changes
+SIMILARITY_INDEX_PATH = os.path.join("data", "processed", "similarity_index.pkl")
+
+def _row_digests(values):
+    return [hashlib.sha256(np.ascontiguousarray(row, dtype=float).tobytes()).hexdigest() for row in values]
+
+def _pairwise(a, b):
+    """
+    Unweighted Euclidean distances between the rows of a and b (missing criteria count as 0 apart).
+    """
+    diff = np.nan_to_num(a[:, None, :] - b[None, :, :])
+    return np.sqrt((diff ** 2).sum(axis=2))
+
+def build_similarity_index(matrix):
+    """
+    Index over the normalized criterion vectors (country × criterion matrix from
+    scoring.criterion_matrix): the vectors, a per-country content digest and the
+    precomputed unweighted distance matrix.
+    """
+    values = matrix[list(CRITERIA)].to_numpy(dtype=float)
+    return {
+        "countries": np.asarray(matrix.index, dtype=object),
+        "criteria": list(CRITERIA),
+        "vectors": values,
+        "digests": _row_digests(values),
+        "distances": _pairwise(values, values)
+    }
+
+@instrumented()
+def update_similarity_index(index, matrix):
+    """
+    Refreshes an index for a new criterion matrix, recomputing only the distance
+    rows/columns of countries that were added or whose vector changed.
+    """
+    if index is None or index["criteria"] != list(CRITERIA):
+        annotate(changed="all")
+        return build_similarity_index(matrix)
+
+    values = matrix[list(CRITERIA)].to_numpy(dtype=float)
+    countries = np.asarray(matrix.index, dtype=object)
+    digests = _row_digests(values)
+
+    previous = {country: n for n, country in enumerate(index["countries"])}
+    old_pos = np.array([previous.get(country, -1) for country in countries])
+    changed = np.array([
+        pos < 0 or index["digests"][pos] != digest for pos, digest in zip(old_pos, digests)
+    ], dtype=bool)
+    annotate(changed=int(changed.sum()))
+
+    # Reuse the old distances between unchanged countries, recompute the rest
+    distances = np.empty((len(countries), len(countries)))
+    kept = np.flatnonzero(~changed)
+    distances[np.ix_(kept, kept)] = index["distances"][np.ix_(old_pos[kept], old_pos[kept])]
+    if changed.any():
+        fresh = _pairwise(values[changed], values)
+        distances[changed, :] = fresh
+        distances[:, changed] = fresh.T
+
+    return {
+        "countries": countries,
+        "criteria": list(CRITERIA),
+        "vectors": values,
+        "digests": digests,
+        "distances": distances
+    }
+
+def load_similarity_index(path=SIMILARITY_INDEX_PATH):
+    if not os.path.exists(path):
+        return None
+    return pd.read_pickle(path)
+
+def save_similarity_index(index, path=SIMILARITY_INDEX_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(index, tmp_path)
+    os.replace(tmp_path, path)
+
+def similar_countries(index, country, k=5, weights=None, better=None, bounds=None):
+    """
+    k nearest countries to `country` in criterion space.
+
+    Args:
+        weights: optional {criterion: weight} for a weighted distance (unlisted criteria weigh 0);
+                 without it the precomputed unweighted distances are used
+        better: criteria on which a neighbour must beat `country` (values are oriented
+                so that higher is better, e.g. "employment" = lower unemployment)
+        bounds: {criterion: (low, high)} limits on the neighbours' normalized values (None = open)
+
+    Returns:
+        DataFrame indexed by country with the distance and the criterion values, nearest first
+    """
+    countries = index["countries"]
+    vectors = index["vectors"]
+    matches = np.flatnonzero(countries == country)
+    if not len(matches):
+        raise KeyError(f"Unknown country: {country}")
+    anchor = matches[0]
+
+    if weights is None:
+        distances = index["distances"][anchor].copy()
+    else:
+        w = np.array([weights.get(key, 0.0) for key in index["criteria"]], dtype=float)
+        diff = np.nan_to_num(vectors - vectors[anchor])
+        distances = np.sqrt((diff ** 2) @ w)
+
+    keep = np.ones(len(countries), dtype=bool)
+    keep[anchor] = False
+    columns = {key: n for n, key in enumerate(index["criteria"])}
+    for key in better or []:
+        keep &= vectors[:, columns[key]] > vectors[anchor, columns[key]]
+    for key, (low, high) in (bounds or {}).items():
+        if low is not None:
+            keep &= vectors[:, columns[key]] >= low
+        if high is not None:
+            keep &= vectors[:, columns[key]] <= high
+
+    candidates = np.flatnonzero(keep)
+    k = min(k, len(candidates))
+    if k == 0:
+        return pd.DataFrame(columns=["distance", *index["criteria"]], index=pd.Index([], name="country"))
+    nearest = candidates[np.argpartition(distances[candidates], k - 1)[:k]]
+    nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+
+    result = pd.DataFrame(vectors[nearest], columns=index["criteria"],
+                          index=pd.Index(countries[nearest], name="country"))
+    result.insert(0, "distance", distances[nearest])
+    return result
@@ -1,10 +1,21 @@
 # src/visuals.py
 
+import io
+import threading
+from collections import OrderedDict
+
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
 import numpy as np
 import seaborn as sns
 
+# Rendered images kept in memory (LRU); each entry is a few hundred KB at most
+RENDER_CACHE_SIZE = 128
+RENDER_DPI = 150
+
+_render_cache = OrderedDict()
+_render_lock = threading.Lock()
+
 def plot_dual_radar(row1, row2, label1, label2):
     categories = row1.index.tolist()
     angles = np.linspace(0, 2 * np.pi, len(categories), endpoint=False).tolist()
@@ -41,4 +52,91 @@ def plot_indicator_over_time(df, country, indicator, ylabel=None):
         ax.set_ylabel(ylabel)
     ax.grid(True)
     ax.xaxis.set_major_locator(MaxNLocator(integer=True)) 
-    return fig
\ No newline at end of file
+    return fig
+
+def plot_forecast(df, pred_df, country, indicator):
+    """
+    Historical series of `indicator` for `country` followed by its forecast, with
+    the forecast's uncertainty band when pred_df has lower / upper columns.
+    """
+    fig, ax = plt.subplots(figsize=(6, 4))
+    sns.lineplot(
+        x="date",
+        y=indicator,
+        data=df[df["country"] == country],
+        label="Historical",
+        ax=ax
+    )
+    sns.lineplot(
+        x="year",
+        y="prediction",
+        data=pred_df,
+        label="Forecast",
+        ax=ax
+    )
+    if {"lower", "upper"} <= set(pred_df.columns):
+        ax.fill_between(pred_df["year"], pred_df["lower"], pred_df["upper"], alpha=0.2,
+                        color=ax.get_lines()[-1].get_color(), label="Forecast interval")
+        ax.legend()
+    ax.set_title(f"{indicator} – {country}")
+    ax.set_xlabel("Year")
+    ax.grid(True)
+    return fig
+
+# --------------------------
+# Render cache
+# --------------------------
+def figure_to_bytes(fig, fmt="png", dpi=RENDER_DPI, size=None):
+    """
+    Renders a figure to PNG/SVG bytes and closes it.
+    """
+    try:
+        if size:
+            fig.set_size_inches(*size)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+def clear_render_cache():
+    with _render_lock:
+        _render_cache.clear()
+
+def cached_render(kind, key, draw, size=None, fmt="png", max_entries=RENDER_CACHE_SIZE):
+    """
+    Returns the rendered bytes of a figure, drawing it only on a cache miss.
+
+    Args:
+        kind: plot type, e.g. "radar"
+        key: hashable tuple identifying the content (countries, indicator, data version, ...)
+        draw: callable returning a matplotlib figure; the figure is always closed
+        size: (width, height) in inches, part of the cache key
+    """
+    cache_key = (kind, key, tuple(size) if size else None, fmt)
+    with _render_lock:
+        if cache_key in _render_cache:
+            _render_cache.move_to_end(cache_key)
+            return _render_cache[cache_key]
+
+    image = figure_to_bytes(draw(), fmt=fmt, size=size)
+
+    with _render_lock:
+        _render_cache[cache_key] = image
+        _render_cache.move_to_end(cache_key)
+        while len(_render_cache) > max_entries:
+            _render_cache.popitem(last=False)
+    return image
+
+def render_dual_radar(row1, row2, label1, label2, version=None, size=None, fmt="png"):
+    # Radar inputs are tiny, so the values themselves are part of the key
+    key = (label1, label2, tuple(row1.items()), tuple(row2.items()), version)
+    return cached_render("radar", key, lambda: plot_dual_radar(row1, row2, label1, label2), size, fmt)
+
+def render_indicator_over_time(df, country, indicator, ylabel=None, version=None, size=None, fmt="png"):
+    key = (country, indicator, ylabel, version)
+    return cached_render("history", key, lambda: plot_indicator_over_time(df, country, indicator, ylabel), size, fmt)
+
+def render_forecast(df, pred_df, country, indicator, version=None, size=None, fmt="png"):
+    key = (country, indicator, len(pred_df), version)
+    return cached_render("forecast", key, lambda: plot_forecast(df, pred_df, country, indicator), size, fmt)
@@ -0,0 +1,118 @@
+# src/wdi_bulk.py
+
+import os
+import zipfile
+
+import pandas as pd
+
+from src.data_fetching import (
+    EUROPE_ASIA_COUNTRIES, INDICATORS_DICT, FETCH_CACHE_FILE,
+    fetch_cache_key, complete_years, to_long_frame, download_file, load_fetch_cache, save_fetch_cache
+)
+from src.instrumentation import instrumented, annotate
+
+# 📦 World Development Indicators bulk download (one wide CSV inside a ZIP)
+WDI_BULK_URL = "https://databank.worldbank.org/data/download/WDI_CSV.zip"
+WDI_ARCHIVE_PATH = os.path.join("data", "raw", "WDI_CSV.zip")
+# Name of the data file inside the archive (WDIData.csv in older releases)
+WDI_DATA_MEMBERS = ("WDICSV.csv", "WDIData.csv")
+ID_COLUMNS = ["Country Name", "Country Code", "Indicator Code"]
+CHUNK_ROWS = 20_000
+
+
+def download_wdi_bulk(url=WDI_BULK_URL, path=WDI_ARCHIVE_PATH):
+    """
+    Streams the bulk archive to disk without holding it in memory.
+    """
+    return download_file(url, path)
+
+
+def _data_member(archive):
+    """
+    Finds the wide data CSV among the archive members (series/country metadata files are skipped).
+    """
+    names = {os.path.basename(name).lower(): name for name in archive.namelist()}
+    for member in WDI_DATA_MEMBERS:
+        if member.lower() in names:
+            return names[member.lower()]
+    raise ValueError(f"No WDI data file ({' / '.join(WDI_DATA_MEMBERS)}) in archive")
+
+
+def iter_wdi_chunks(archive_path, indicator_codes, countries, start_year=2003, end_year=2023,
+                    chunk_rows=CHUNK_ROWS):
+    """
+    Reads the wide WDI CSV straight from the ZIP in chunks, keeping only the wanted
+    indicators, countries and year columns, and yields them in long format
+    (country, country_code, indicator, date, value).
+
+    Memory is bounded by `chunk_rows`, not by the size of the archive.
+    """
+    indicator_codes = set(indicator_codes)
+    countries = set(countries)
+    years = {str(year) for year in range(start_year, end_year + 1)}
+
+    with zipfile.ZipFile(archive_path) as archive, archive.open(_data_member(archive)) as stream:
+        reader = pd.read_csv(
+            stream,
+            usecols=lambda column: column in ID_COLUMNS or column.strip() in years,
+            dtype={column: str for column in ID_COLUMNS},
+            chunksize=chunk_rows,
+            encoding="utf-8-sig"
+        )
+        for chunk in reader:
+            chunk = chunk[chunk["Indicator Code"].isin(indicator_codes) & chunk["Country Code"].isin(countries)]
+            if chunk.empty:
+                continue
+            chunk = chunk.rename(columns=lambda column: column.strip())
+            yield chunk.melt(id_vars=ID_COLUMNS, var_name="date", value_name="value").rename(columns={
+                "Country Name": "country", "Country Code": "country_code", "Indicator Code": "indicator"
+            })
+
+
+@instrumented()
+def import_wdi_bulk(archive_path=WDI_ARCHIVE_PATH, indicators=INDICATORS_DICT, countries=EUROPE_ASIA_COUNTRIES,
+                    start_year=2003, end_year=2023, output_dir="data/raw", chunk_rows=CHUNK_ROWS):
+    """
+    Imports a full refresh from the bulk archive into the same per-indicator CSVs
+    (country, country_code, date, value) as fetch_multiple_indicators, and records
+    the retrieved years in the fetch cache so later incremental API refreshes
+    only request what is missing.
+
+    Returns:
+        dict {indicator name: number of rows written}
+    """
+    countries = list(countries)
+    os.makedirs(output_dir, exist_ok=True)
+
+    parts = {code: [] for code in indicators}
+    for chunk in iter_wdi_chunks(archive_path, indicators, countries, start_year, end_year, chunk_rows):
+        for code, rows in chunk.groupby("indicator", sort=False):
+            parts[code].append(rows.drop(columns="indicator"))
+
+    cache_path = os.path.join(output_dir, FETCH_CACHE_FILE)
+    cache = load_fetch_cache(cache_path)
+    written = {}
+    for code, name in indicators.items():
+        if not parts[code]:
+            print(f"No data in archive for {code}")
+            continue
+
+        df = to_long_frame(pd.concat(parts[code], ignore_index=True), countries)
+        path = os.path.join(output_dir, f"{name}_worldbank.csv")
+        df.to_csv(path, index=False)
+        written[name] = len(df)
+        print(f"Saved: {path}")
+
+        cache[fetch_cache_key(code, countries, start_year, end_year)] = {
+            "indicator": code,
+            "countries": sorted(countries),
+            "start_year": start_year,
+            "end_year": end_year,
+            "years": sorted(int(year) for year in df["date"].unique()),
+            "complete_years": complete_years(df, countries),
+            "lastupdated": None,  # unknown: the next incremental run re-checks incomplete years
+        }
+
+    save_fetch_cache(cache, cache_path)
+    annotate(rows=sum(written.values()))
+    return written
@@ -4,20 +4,26 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
-import numpy as np
 import streamlit as st
-import seaborn as sns
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import MinMaxScaler
-from src.preprocessing import load_and_clean_indicator, get_common_year, aggregate_historical
-from src.scoring import compute_relocation_score
-from src.visuals import plot_dual_radar, plot_indicator_over_time
-from src.predictive import predict_linear_trend, predict_random_forest_trend
-from functools import reduce
+from streamlit.errors import StreamlitAPIException
+from src.preprocessing import aggregate_historical, build_panel_store, load_panel, load_hdi, open_panel_store, panel_store_version, PANEL_STORE_DIR
+from src.scoring import normalize_indicators, criterion_matrix, apply_weights, criterion_cube, rank_trajectories
+from src.pipeline import current_build_version, open_build, published_forecast
+from src.similarity import build_similarity_index, similar_countries
+from src import instrumentation
+# matplotlib/seaborn (src.visuals) and sklearn (src.model_store) are imported in the
+# sections that need them, so the ranking paints without loading them
 
 st.set_page_config(page_title="Relocation Score App", layout="wide")
 
+# Sections rerun on their own when only their widgets change (experimental in older Streamlit)
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
 st.title("🌍 Data-Driven Relocation")
 st.markdown("Set your priorities and discover the country that best matches your lifestyle.")
 
@@ -38,18 +44,6 @@ CONTEXT_DATA = {
 }
 context_df = pd.DataFrame(CONTEXT_DATA)
 
-# Load HDI external data and merge
-hdi_path = os.path.join("data", "external", "hdi_historical.csv")
-hdi_df = pd.read_csv(hdi_path)
-hdi_df = hdi_df.rename(columns={
-    "Entity": "country",
-    "Year": "date",
-    "Human Development Index": "hdi"
-})
-hdi_df["date"] = hdi_df["date"].astype(int) 
-hdi_df = hdi_df.rename(columns={"date": "date", "hdi": "hdi", "country": "country"})
-
-
 # --------------------------
 # WEIGHT SELECTION
 # --------------------------
@@ -78,29 +72,52 @@ weights = {
 # --------------------------
 # LOAD DATA
 # --------------------------
-@st.cache_data
-def load_data():
-    dfs = []
-    for ind in INDICATORS:
-        path = os.path.join("data/raw", f"{ind}_worldbank.csv")
-        df = load_and_clean_indicator(path, ind)
-        dfs.append(df)
-    merged = aggregate_historical(dfs)
-    merged = pd.merge(merged, hdi_df, on=["country", "date"], how="left")
-    return compute_relocation_score(merged, context_df, weights)
-
-@st.cache_data
-def load_historical_raw():
-    dfs = []
-    for ind in INDICATORS:
-        path = os.path.join("data/raw", f"{ind}_worldbank.csv")
-        df = load_and_clean_indicator(path, ind)
-        dfs.append(df)
-    merged = reduce(lambda l, r: pd.merge(l, r, on=["country", "country_code", "date"], how="outer"), dfs)
-    return merged
-
-df_scored = load_data()
-df_raw = load_historical_raw()
+def load_panel_store():
+    # The pipeline (main.py) compiles the panel; build it here only if it is missing
+    if not os.path.exists(os.path.join(PANEL_STORE_DIR, "meta.json")):
+        build_panel_store(INDICATORS)
+    return load_panel(indicators=INDICATORS)
+
+def compile_app_data():
+    # Nothing published by main.py yet: compile from the panel store (weight-independent)
+    panel = load_panel_store()
+    # HDI joined on ISO3 code from the cached, pre-filtered artifact
+    hdi_df = load_hdi(country_codes=panel["country_code"].unique(), years=panel["date"].unique())
+    merged = aggregate_historical([panel])
+    merged = pd.merge(merged, hdi_df, on=["country_code", "date"], how="left")
+    matrix = criterion_matrix(normalize_indicators(merged, context_df))
+    _, meta = open_panel_store()
+    return {
+        "version": panel_store_version(),
+        "matrix": matrix,
+        "countries": sorted(meta["country_names"]),
+        "country_codes": dict(zip(meta["country_names"], meta["countries"])),
+        "panel_dir": PANEL_STORE_DIR,
+        "forecasts": None,
+        "cube": criterion_cube(panel.merge(hdi_df, on=["country_code", "date"], how="left"), context_df),
+        "similarity": build_similarity_index(matrix)
+    }
+
+@st.cache_resource(max_entries=2)
+def shared_app_data(version):
+    # One read-only (memory-mapped) copy per process, shared by every session;
+    # when main.py publishes a new build the version changes and it is swapped in
+    return open_build(version) if version else compile_app_data()
+
+def country_history(app_data, country):
+    # Only this country's slice of the memory-mapped panel is read
+    return load_panel(store_dir=app_data["panel_dir"], indicators=INDICATORS,
+                      countries=[app_data["country_codes"][country]])
+
+# Per-rerun section timings of this session (enable with RELOCATION_PROFILE=1)
+instrumentation.start_run()
+
+with instrumentation.stage("app.load_data"):
+    app_data = shared_app_data(current_build_version())
+    score_matrix = app_data["matrix"]
+    scores = apply_weights(score_matrix, weights)
+    # Rendered charts are cached per data version (see src/visuals.py)
+    data_version = app_data["version"]
 
 # --------------------------
 # FINAL RANKING + RECOMMENDATION
@@ -109,7 +126,7 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("📈 Country ranking based on your preferences")
-    ranking = df_scored[["country", "relocation_score"]].sort_values(by="relocation_score", ascending=False)
+    ranking = scores.reset_index().sort_values(by="relocation_score", ascending=False)
     st.dataframe(ranking.set_index("country").style.format("{:.3f}"))
 
 with col2:
@@ -138,91 +155,222 @@ with col2:
 # --------------------------
 # COUNTRY COMPARISON (RADAR)
 # --------------------------
-st.subheader("🕵️ Compare two countries side by side")
-col_sel, col_chart = st.columns([1, 2])
-
-with col_sel:
-    cols = df_scored[["country"]].drop_duplicates().sort_values("country")["country"].tolist()
-    c1 = st.selectbox("Country A", cols, index=0)
-    c2 = st.selectbox("Country B", cols, index=1)
-
-    st.markdown("""
-    **Radar chart indicators:**
-    - **GDP**: Income per capita.
-    - **Education**: Education investment (% GDP).
-    - **Equality**: Income equality (Gini index, inverted).
-    - **Maternity**: Family support policies.
-    - **Employment**: Inverted unemployment rate.
-    - **Stability**: Economic stability (low inflation).
-    - **HDI**: Human Development Index (UN)
-    """)
+criterion_labels = {
+    "gdp": "Income", "gini": "Equality", "education": "Education", "maternity": "Maternity",
+    "employment": "Employment", "stability": "Stability", "hdi": "HDI"
+}
+
+@fragment
+def comparison_section(score_matrix, countries, data_version):
+    st.subheader("🕵️ Compare two countries side by side")
+    col_sel, col_chart = st.columns([1, 2])
+
+    with col_sel:
+        c1 = st.selectbox("Country A", countries, index=0)
+        c2 = st.selectbox("Country B", countries, index=1)
+
+        st.markdown("""
+        **Radar chart indicators:**
+        - **GDP**: Income per capita.
+        - **Education**: Education investment (% GDP).
+        - **Equality**: Income equality (Gini index, inverted).
+        - **Maternity**: Family support policies.
+        - **Employment**: Inverted unemployment rate.
+        - **Stability**: Economic stability (low inflation).
+        - **HDI**: Human Development Index (UN)
+        """)
+
+    with col_chart:
+        comparison_df = score_matrix[[
+            "gdp", "education", "gini", "maternity", "employment", "stability", "hdi"
+        ]].rename(columns={
+            "gdp": "GDP",
+            "education": "Education",
+            "gini": "Equality",
+            "maternity": "Maternity",
+            "employment": "Employment",
+            "stability": "Stability",
+            "hdi": "HDI"
+        })
+        with instrumentation.stage("app.radar"):
+            from src.visuals import render_dual_radar
+            st.image(render_dual_radar(
+                comparison_df.loc[c1],
+                comparison_df.loc[c2],
+                label1=c1,
+                label2=c2,
+                version=data_version
+            ))
+
+# --------------------------
+# SIMILAR COUNTRIES
+# --------------------------
+@fragment
+def similarity_section(similarity_index, countries, weights):
+    st.subheader("🔎 Countries like...")
+    col_query, col_neighbours = st.columns([1, 2])
+
+    with col_query:
+        anchor = st.selectbox("Find countries similar to", countries,
+                              index=countries.index("Portugal") if "Portugal" in countries else 0)
+        better = st.multiselect("...but better on", list(criterion_labels), format_func=criterion_labels.get)
+        use_weights = st.checkbox("Weight similarity by my priorities", value=False)
+        max_neighbours = max(len(countries) - 1, 1)
+        n_neighbours = st.slider("Number of countries", min_value=1, max_value=max_neighbours,
+                                 value=min(3, max_neighbours))
 
-with col_chart:
-    comparison_df = df_scored.set_index("country")[[
-        "gdp_per_capita", "education_spending_gdp", "gini_index_inverted",
-        "maternity_score", "unemployment", "inflation", "hdi"
-    ]].copy()
-    comparison_df["unemployment"] = 1 - comparison_df["unemployment"]
-    comparison_df["inflation"] = 1 - comparison_df["inflation"]
-    comparison_df = comparison_df.rename(columns={
-        "gdp_per_capita": "GDP",
-        "education_spending_gdp": "Education",
-        "gini_index_inverted": "Equality",
-        "maternity_score": "Maternity",
-        "unemployment": "Employment",
-        "inflation": "Stability",
-        "hdi": "HDI"
-    })
-    fig = plot_dual_radar(
-        comparison_df.loc[c1],
-        comparison_df.loc[c2],
-        label1=c1,
-        label2=c2
-    )
-    st.pyplot(fig)
+    with col_neighbours, instrumentation.stage("app.similarity"):
+        neighbours = similar_countries(similarity_index, anchor, k=n_neighbours, better=better,
+                                       weights=weights if use_weights else None)
+        if neighbours.empty:
+            st.info("No country matches these constraints.")
+        else:
+            st.dataframe(neighbours.rename(columns=criterion_labels).style.format("{:.3f}"))
+
+# --------------------------
+# RANKING OVER TIME
+# --------------------------
+@fragment
+def trajectories_section(cube, weights, ranked_countries):
+    st.subheader("📅 How your ranking evolves over time")
+    col_window, col_trend = st.columns([1, 2])
+
+    with col_window:
+        window = st.slider("Years averaged per point", min_value=1, max_value=5, value=1)
+        st.markdown("Each year is normalized and scored on its own with your weights (1 = best rank).")
+
+    with col_trend, instrumentation.stage("app.trajectories"):
+        cube_values, cube_countries, cube_years = cube
+        trajectories = rank_trajectories(cube_values, cube_countries, cube_years, weights, window=window)
+        st.line_chart(trajectories.pivot(index="year", columns="country", values="relocation_score"))
+        st.dataframe(trajectories.pivot(index="country", columns="year", values="rank").loc[ranked_countries])
 
 # --------------------------
 # HISTORICAL TREND + FORECAST
 # --------------------------
-st.subheader("📊 Historical evolution and forecast")
-col_controls, col_graphs = st.columns([1, 2])
+@st.cache_resource
+def forecast_jobs():
+    # Shared by all sessions: a model keeps training even if the user moves on meanwhile.
+    # The lock guards the in-flight jobs dict, which sessions on other threads also read and write
+    return ThreadPoolExecutor(max_workers=2), {}, threading.Lock()
+
+def background_forecast(df, country, indicator, years_ahead, data_version):
+    """
+    Serves a forecast from the store, or fits it on a worker thread. Returns None
+    while it is still training. Sessions asking for the same series share one job.
+    """
+    from src.model_store import cached_forecast, lookup_forecast
+
+    # Read synchronously, so a finished (and forgotten) job is not resubmitted on the next poll
+    pred_df = lookup_forecast(df, country, indicator, years_ahead)
+    if pred_df is not None:
+        return pred_df
+
+    executor, jobs, lock = forecast_jobs()
+    key = (data_version, country, indicator, years_ahead)
+    with lock:
+        job = jobs.get(key)
+        submitted = job is None
+        if submitted:
+            job = jobs[key] = executor.submit(cached_forecast, df, country, indicator, years_ahead)
+
+    if submitted:
+        def forget(_):
+            # Finished fits are in the forecast store, so later requests are cache hits.
+            # Added outside the lock: an already finished job runs this immediately
+            with lock:
+                jobs.pop(key, None)
+        job.add_done_callback(forget)
+
+    return job.result() if job.done() else None
 
-with col_controls:
-    selected_country = st.selectbox("Select a country", sorted(df_raw["country"].unique()), index=0)
-    indicator_to_predict = st.selectbox("Select an indicator", [
-        "gdp_per_capita", "education_spending_gdp", "gini_index", "unemployment", "inflation"
-    ])
-    years_to_forecast = st.slider("Years to forecast", min_value=5, max_value=30, value=20)
+# How often a section waiting on a background fit checks it again
+FORECAST_POLL_SECONDS = 0.5
 
-with col_graphs:
-    col_hist, col_pred = st.columns(2)
+def poll_forecast_section():
+    # Rerun only the forecast section; the whole script when this is a full run (a fragment
+    # rerun can only be requested from a fragment rerun) or on Streamlit < 1.37 (no scope)
+    time.sleep(FORECAST_POLL_SECONDS)
+    try:
+        st.rerun(scope="fragment")
+    except (TypeError, StreamlitAPIException):
+        st.rerun()
 
-    with col_hist:
-        fig_hist = plot_indicator_over_time(df_raw, selected_country, indicator_to_predict, ylabel=indicator_to_predict.replace("_", " ").title())
-        fig_hist.set_size_inches(6, 4)
-        st.pyplot(fig_hist)
+def load_history(app_data, country):
+    # A session can outlive its build: once newer builds are published, older ones are
+    # pruned (see publish_build), so switch to the live build when the files are gone
+    try:
+        return app_data, country_history(app_data, country)
+    except FileNotFoundError:
+        app_data = shared_app_data(current_build_version())
+        return app_data, country_history(app_data, country)
 
-    with col_pred:
+@fragment
+def forecast_section(app_data):
+    data_version = app_data["version"]
+
+    st.subheader("📊 Historical evolution and forecast")
+    col_controls, col_graphs = st.columns([1, 2])
+
+    with col_controls:
+        selected_country = st.selectbox("Select a country", app_data["countries"], index=0)
+        indicator_to_predict = st.selectbox("Select an indicator", [
+            "gdp_per_capita", "education_spending_gdp", "gini_index", "unemployment", "inflation"
+        ])
+        years_to_forecast = st.slider("Years to forecast", min_value=5, max_value=30, value=20)
+
+    with col_graphs:
+        col_hist, col_pred = st.columns(2)
         try:
-            pred_df, model = predict_random_forest_trend(df_raw, selected_country, indicator_to_predict, years_to_forecast)
-            fig_pred, ax = plt.subplots(figsize=(6, 4))
-            sns.lineplot(
-                x="date",
-                y=indicator_to_predict,
-                data=df_raw[df_raw["country"] == selected_country],
-                label="Historical",
-                ax=ax
-            )
-            sns.lineplot(
-                x="year",
-                y="prediction",
-                data=pred_df,
-                label="Forecast",
-                ax=ax
-            )
-            ax.set_title(f"{indicator_to_predict} – {selected_country}")
-            ax.set_xlabel("Year")
-            ax.grid(True)
-            st.pyplot(fig_pred)
+            app_data, df_raw = load_history(app_data, selected_country)
         except Exception as e:
-            st.warning(f"⚠️ Prediction could not be generated: {e}")
\ No newline at end of file
+            st.warning(f"⚠️ History could not be loaded: {e}")
+            return
+        data_version = app_data["version"]
+
+        with col_hist, instrumentation.stage("app.history"):
+            from src.visuals import render_indicator_over_time
+            st.image(render_indicator_over_time(
+                df_raw, selected_country, indicator_to_predict,
+                ylabel=indicator_to_predict.replace("_", " ").title(),
+                version=data_version, size=(6, 4)
+            ))
+
+        with col_pred, instrumentation.stage("app.forecast"):
+            training = False
+            try:
+                from src.visuals import render_forecast
+                # Precomputed in the published build, else served from (or fitted into) the forecast store
+                pred_df = published_forecast(app_data["forecasts"], selected_country, indicator_to_predict, years_to_forecast)
+                if pred_df is None:
+                    pred_df = background_forecast(df_raw, selected_country, indicator_to_predict,
+                                                  years_to_forecast, data_version)
+                    training = pred_df is None
+                if training:
+                    st.info("⏳ Training the forecast model in the background...")
+                else:
+                    st.image(render_forecast(df_raw, pred_df, selected_country, indicator_to_predict,
+                                             version=data_version, size=(6, 4)))
+            except Exception as e:
+                st.warning(f"⚠️ Prediction could not be generated: {e}")
+
+    if training:
+        poll_forecast_section()
+
+# Sliders in the sidebar rerun everything (all sections depend on the weights);
+# widgets inside a section only rerun that section
+countries = sorted(score_matrix.index)
+comparison_section(score_matrix, countries, data_version)
+# Published by main.py (refreshed incrementally); built on the fly otherwise
+similarity_section(app_data["similarity"] or build_similarity_index(score_matrix), countries, weights)
+trajectories_section(app_data["cube"], weights, ranking["country"].tolist())
+forecast_section(app_data)
+
+# --------------------------
+# DIAGNOSTICS
+# --------------------------
+if instrumentation.is_enabled():
+    with st.sidebar.expander("⏱️ Diagnostics"):
+        records = instrumentation.run_records()
+        if records:
+            st.dataframe(pd.DataFrame(records).drop(columns="ts").set_index("stage"))
@@ -0,0 +1,141 @@
+import os
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.preprocessing import YEAR_DTYPE, aggregate_panel, build_panel, compact_panel, load_and_clean_indicator
+from src.scoring import criterion_cube, criterion_matrix, normalize_indicators
+from src.predictive import forecast_linear_batch, predict_linear_trend
+from src.visuals import plot_forecast, plot_indicator_over_time
+
+INDICATORS = ["gdp_per_capita", "inflation", "unemployment", "gini_index", "education_spending_gdp"]
+
+
+@pytest.fixture(scope="module")
+def compact_frames(tmp_path_factory):
+    """
+    Cleaned indicator frames (compact schema) loaded from World Bank-shaped CSVs.
+    """
+    raw_path = tmp_path_factory.mktemp("raw")
+    rng = np.random.default_rng(0)
+    countries = [(f"Country {i:02d}", f"C{i:02d}") for i in range(30, 0, -1)]
+    years = np.arange(2003, 2024)
+    for name in INDICATORS:
+        values = rng.uniform(1, 100, size=len(countries) * len(years))
+        values[rng.random(values.size) < 0.1] = np.nan
+        pd.DataFrame({
+            "country": np.repeat([c for c, _ in countries], len(years)),
+            "country_code": np.repeat([code for _, code in countries], len(years)),
+            "date": np.tile(years[::-1], len(countries)),
+            "value": values
+        }).to_csv(os.path.join(raw_path, f"{name}_worldbank.csv"), index=False)
+    return [load_and_clean_indicator(os.path.join(raw_path, f"{name}_worldbank.csv"), name) for name in INDICATORS]
+
+
+def _object_keys(df):
+    """
+    The same frame in the previous layout: string keys and int64 years.
+    """
+    return df.astype({"country": object, "country_code": object, "date": "int64"})
+
+
+def _plain(df):
+    """
+    Key columns as plain Python objects, so frames compare by value whatever
+    string dtype pandas infers for them.
+    """
+    keys = {column: object for column in ("country", "country_code") if column in df}
+    return df.astype(keys)
+
+
+def _assert_same(compact, loose, **kwargs):
+    pd.testing.assert_frame_equal(_plain(compact), _plain(loose), **kwargs)
+
+
+@pytest.fixture(scope="module")
+def panels(compact_frames):
+    return build_panel(compact_frames), build_panel([_object_keys(df) for df in compact_frames])
+
+
+@pytest.fixture(scope="module")
+def context():
+    return pd.DataFrame({"country": [f"Country {i:02d}" for i in range(1, 31)],
+                         "maternity_score": np.arange(30) % 5 + 1})
+
+
+def _with_hdi(panel):
+    hdi = pd.DataFrame({"country_code": [f"C{i:02d}" for i in range(1, 31)]})
+    hdi = hdi.merge(pd.DataFrame({"date": np.arange(2003, 2024)}), how="cross")
+    hdi["hdi"] = np.linspace(0.4, 0.95, len(hdi))
+    return panel.merge(hdi, on=["country_code", "date"], how="left")
+
+
+def test_cleaned_frames_use_the_compact_dtypes(compact_frames):
+    for df in compact_frames:
+        for column in ("country", "country_code"):
+            assert isinstance(df[column].dtype, pd.CategoricalDtype)
+            categories = list(df[column].cat.categories)
+            assert categories == sorted(categories)
+        assert df["date"].dtype == YEAR_DTYPE
+
+
+def test_compact_footprint_is_below_object_keys(panels):
+    compact, _ = panels
+    loose = _object_keys(compact)
+
+    def footprint(df):
+        return df.memory_usage(deep=True).sum()
+
+    assert footprint(compact) < footprint(loose)
+    assert footprint(compact_panel(compact, "float32")) < footprint(compact)
+
+
+def test_build_panel_and_aggregations_are_unchanged(panels):
+    compact, loose = panels
+    _assert_same(compact.astype({"date": "int64"}), loose)
+    for how in ("mean", "latest", "recent"):
+        _assert_same(aggregate_panel(compact, how=how), aggregate_panel(loose, how=how), check_dtype=False)
+
+
+def test_scoring_is_unchanged(panels, context):
+    compact, loose = panels
+
+    def matrix(panel):
+        merged = _with_hdi(aggregate_panel(panel)).drop(columns="date")
+        return criterion_matrix(normalize_indicators(merged, context))
+
+    pd.testing.assert_frame_equal(matrix(compact), matrix(loose))
+
+    cube, countries, years = criterion_cube(_with_hdi(compact), context)
+    expected_cube, expected_countries, expected_years = criterion_cube(_with_hdi(loose), context)
+    np.testing.assert_array_equal(cube, expected_cube)
+    np.testing.assert_array_equal(np.asarray(countries, dtype=object), expected_countries)
+    np.testing.assert_array_equal(years, expected_years)
+
+
+def test_forecasts_are_unchanged(panels):
+    compact, loose = panels
+    _assert_same(forecast_linear_batch(compact, INDICATORS), forecast_linear_batch(loose, INDICATORS))
+    pred_compact, _ = predict_linear_trend(compact, "Country 05", "inflation")
+    pred_loose, _ = predict_linear_trend(loose, "Country 05", "inflation")
+    pd.testing.assert_frame_equal(pred_compact, pred_loose, check_dtype=False)
+
+
+def test_charts_plot_the_same_data(panels):
+    import matplotlib.pyplot as plt
+
+    compact, loose = panels
+    pred_df, _ = predict_linear_trend(loose, "Country 05", "inflation")
+    for draw in (
+        lambda df: plot_indicator_over_time(df, "Country 05", "inflation"),
+        lambda df: plot_forecast(df, pred_df, "Country 05", "inflation")
+    ):
+        fig_compact, fig_loose = draw(compact), draw(loose)
+        for line_compact, line_loose in zip(fig_compact.axes[0].lines, fig_loose.axes[0].lines):
+            np.testing.assert_array_equal(line_compact.get_xydata(), line_loose.get_xydata())
+        plt.close(fig_compact)
+        plt.close(fig_loose)
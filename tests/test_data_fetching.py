@@ -0,0 +1,134 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from src import data_fetching
+from src.data_fetching import fetch_multiple_indicators, fetch_world_bank_data
+
+COUNTRIES = ["DEU", "FRA", "ITA", "ESP", "NLD"]
+LAST_UPDATED = "2024-06-30"
+
+
+def _value(indicator, country, year):
+    return float(sum(map(ord, indicator + country)) + year - 2000)
+
+
+class WorldBankStub(BaseHTTPRequestHandler):
+    """
+    Minimal World Bank v2 API: /country/<a;b;...>/indicator/<code>?date=&per_page=&page=.
+    Indicators whose code starts with RATE answer 429 (Retry-After: 0) to their first request.
+    """
+    requests = []
+    rate_limited = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        _, _, countries, _, indicator = url.path.split("/")
+        with self.lock:
+            self.requests.append({"countries": countries.split(";"), "indicator": indicator, **query})
+            first_hit = indicator.startswith("RATE") and indicator not in self.rate_limited
+            self.rate_limited.add(indicator)
+
+        if first_hit:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        start, end = map(int, query.get("date", "2003:2005").split(":"))
+        rows = [
+            {"country": {"id": code[:2], "value": f"Country {code}"}, "countryiso3code": code,
+             "date": str(year), "value": _value(indicator, code, year)}
+            for code in countries.split(";") for year in range(end, start - 1, -1)
+        ]
+        per_page = int(query.get("per_page", 50))
+        page = int(query.get("page", 1))
+        pages = max(1, -(-len(rows) // per_page))
+        body = [{"page": page, "pages": pages, "per_page": per_page, "total": len(rows),
+                 "lastupdated": LAST_UPDATED},
+                rows[(page - 1) * per_page:page * per_page]]
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    # Small pages and batches so a handful of countries exercises both
+    monkeypatch.setattr(data_fetching, "PER_PAGE", 4)
+    monkeypatch.setattr(data_fetching, "COUNTRIES_PER_REQUEST", 2)
+    WorldBankStub.requests = []
+    WorldBankStub.rate_limited = set()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WorldBankStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", WorldBankStub.requests
+    server.shutdown()
+    server.server_close()
+
+
+def _data_requests(requests):
+    # The lastupdated probe asks for a single row; everything else is a data page
+    return [r for r in requests if r.get("per_page") != "1"]
+
+
+def test_batches_countries_and_follows_every_page(stub):
+    base_url, requests = stub
+    df = fetch_world_bank_data("GDP", COUNTRIES, 2003, 2005, base_url=base_url, max_workers=2)
+
+    assert len(df) == len(COUNTRIES) * 3
+    assert df["country_code"].drop_duplicates().tolist() == COUNTRIES
+    assert df.groupby("country_code")["date"].apply(list).map(lambda d: d == [2005, 2004, 2003]).all()
+    assert (df["value"] == [_value("GDP", c, y) for c, y in zip(df["country_code"], df["date"])]).all()
+
+    # 5 countries in batches of 2 → 3 batches; 6 rows per batch at 4 per page → 2 pages each
+    batches = {tuple(r["countries"]) for r in requests}
+    assert batches == {("DEU", "FRA"), ("ITA", "ESP"), ("NLD",)}
+    assert sorted(r["page"] for r in requests if len(r["countries"]) == 2) == ["1", "1", "2", "2"]
+
+
+def test_retries_after_429_honouring_retry_after(stub, monkeypatch):
+    base_url, requests = stub
+    sleeps = []
+    monkeypatch.setattr(data_fetching.time, "sleep", sleeps.append)
+
+    df = fetch_world_bank_data("RATE.LIMITED", ["DEU"], 2003, 2004, base_url=base_url, max_workers=1)
+
+    assert df["value"].notna().sum() == 2
+    assert sleeps == [0.0]
+    assert len(requests) == 2
+
+
+def test_incremental_second_run_requests_no_data(stub, tmp_path, capsys):
+    base_url, requests = stub
+    indicators = {"GDP": "gdp", "INF": "inflation"}
+
+    fetch_multiple_indicators(COUNTRIES, indicators, 2003, 2005, base_url=base_url,
+                              output_dir=str(tmp_path), incremental=True, max_workers=2)
+    first = pd.read_csv(tmp_path / "gdp_worldbank.csv")
+    assert len(first) == len(COUNTRIES) * 3
+    assert _data_requests(requests)
+
+    requests.clear()
+    capsys.readouterr()
+    fetch_multiple_indicators(COUNTRIES, indicators, 2003, 2005, base_url=base_url,
+                              output_dir=str(tmp_path), incremental=True, max_workers=2)
+
+    assert _data_requests(requests) == []
+    output = capsys.readouterr().out
+    assert "Up to date: gdp" in output and "Up to date: inflation" in output
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "gdp_worldbank.csv"), first)
@@ -0,0 +1,91 @@
+import os
+import json
+
+import pandas as pd
+import pytest
+
+from src.hdi_import import HDI_COLUMNS, merge_hdi, parse_chart_payload, read_hdi_source, read_undp_composite
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+UNDP_SAMPLE = os.path.join(FIXTURES, "undp_composite_sample.csv")
+CHART_PAYLOAD = os.path.join(FIXTURES, "hdi_chart_payload.json")
+
+# Historical file before the import: Africa is a regional aggregate without a code,
+# and Côte d'Ivoire is already listed under another name
+HISTORY = pd.DataFrame([
+    ("Africa", None, 2021, 0.5),
+    ("Germany", "DEU", 2020, 0.947),
+    ("Germany", "DEU", 2021, 0.940),
+    ("Ivory Coast", "CIV", 2020, 0.530),
+    ("Norway", "NOR", 2019, 0.957),
+    ("Norway", "NOR", 2020, 0.959),
+    ("Norway", "NOR", 2021, 0.961),
+    ("Norway", "NOR", 2022, 0.960),
+], columns=HDI_COLUMNS)
+
+
+def _hdi(df):
+    return df.set_index(["Code", "Year"])["Human Development Index"]
+
+
+def test_undp_composite_keeps_countries_and_hdi_years_only():
+    df = read_undp_composite(UNDP_SAMPLE)
+
+    assert list(df.columns) == HDI_COLUMNS
+    # ZZA.VHHD / ZZK.WORLD are aggregates; AFG has no 2020 value
+    assert sorted(df["Code"].unique()) == ["AFG", "CIV", "DEU", "NOR"]
+    assert len(df) == 11
+    # hdi_rank_/hdi_f_/hdi_m_/le_ columns are other series
+    assert sorted(df["Year"].unique()) == [2020, 2021, 2022]
+    assert _hdi(df)[("NOR", 2022)] == pytest.approx(0.966)
+    assert "Côte d'Ivoire" in set(df["Entity"])
+
+
+def test_chart_payload_reads_every_point_format():
+    with open(CHART_PAYLOAD, encoding="utf-8") as f:
+        payload = json.load(f)
+
+    df = parse_chart_payload(payload, country_codes={"Germany": "DEU"})
+
+    # Japan has no code in the payload nor in the mapping; nulls are skipped
+    assert sorted(zip(df["Code"], df["Year"])) == [("DEU", 2020), ("DEU", 2021), ("NOR", 2021), ("NOR", 2022)]
+    assert _hdi(df)[("DEU", 2021)] == pytest.approx(0.946)
+
+    df = read_hdi_source(CHART_PAYLOAD, country_codes={"Germany": "DEU", "Japan": "JPN"})
+    assert _hdi(df)[("JPN", 2022)] == pytest.approx(0.920)
+    assert "ZZA.VHHD" not in set(df["Code"])
+
+
+def test_merge_counts_and_keeps_existing_rows_and_names(tmp_path):
+    path = str(tmp_path / "hdi_historical.csv")
+    HISTORY.to_csv(path, index=False)
+
+    stats = merge_hdi(read_undp_composite(UNDP_SAMPLE), path)
+
+    assert stats == {"added": 5, "updated": 2, "unchanged": 4}
+    merged = pd.read_csv(path)
+    assert len(merged) == len(HISTORY) + 5
+    assert ((merged["Entity"] == "Africa") & merged["Code"].isna()).sum() == 1
+    assert set(merged.loc[merged["Code"] == "CIV", "Entity"]) == {"Ivory Coast"}
+    values = _hdi(merged.dropna(subset=["Code"]))
+    assert values[("NOR", 2019)] == pytest.approx(0.957)
+    assert values[("NOR", 2022)] == pytest.approx(0.966)
+    assert values[("DEU", 2021)] == pytest.approx(0.946)
+    assert values[("AFG", 2022)] == pytest.approx(0.462)
+
+
+def test_merge_leaves_the_file_alone_when_nothing_changed(tmp_path):
+    path = str(tmp_path / "hdi_historical.csv")
+    new = read_undp_composite(UNDP_SAMPLE)
+    merge_hdi(new, path)
+    with open(path, "rb") as f:
+        content = f.read()
+    mtime = os.stat(path).st_mtime_ns
+
+    stats = merge_hdi(new, path)
+
+    assert stats == {"added": 0, "updated": 0, "unchanged": 11}
+    assert os.stat(path).st_mtime_ns == mtime
+    with open(path, "rb") as f:
+        assert f.read() == content
+    assert os.listdir(tmp_path) == ["hdi_historical.csv"]
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from src import instrumentation
+
+
+@pytest.fixture
+def enabled():
+    instrumentation.enable(output=None)
+    instrumentation.clear_records()
+    yield
+    instrumentation.disable()
+    instrumentation.clear_records()
+
+
+def test_run_records_are_scoped_to_their_own_thread(enabled):
+    barrier = threading.Barrier(3)
+    seen = {}
+
+    def session(name):
+        instrumentation.start_run()
+        barrier.wait()
+        for n in range(20):
+            with instrumentation.stage(f"{name}.{n}"):
+                pass
+        barrier.wait()
+        seen[name] = [r["stage"] for r in instrumentation.run_records()]
+
+    def background():
+        # e.g. a forecast worker: no run of its own
+        barrier.wait()
+        with instrumentation.stage("worker"):
+            pass
+        barrier.wait()
+
+    threads = [threading.Thread(target=session, args=(name,)) for name in ("a", "b")]
+    threads.append(threading.Thread(target=background))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen["a"] == [f"a.{n}" for n in range(20)]
+    assert seen["b"] == [f"b.{n}" for n in range(20)]
+    assert len(instrumentation.get_records()) == 41
+
+
+def test_start_run_resets_the_current_threads_records(enabled):
+    instrumentation.start_run()
+    with instrumentation.stage("first"):
+        pass
+    instrumentation.start_run()
+    with instrumentation.stage("second"):
+        pass
+    assert [r["stage"] for r in instrumentation.run_records()] == ["second"]
+
+
+def test_memory_is_only_traced_on_request(enabled):
+    instrumentation.start_run()
+    with instrumentation.stage("untraced"):
+        pass
+    record, = instrumentation.run_records()
+    assert "peak_mb" not in record and "memory_traced" not in record
+
+    instrumentation.enable(output=None, trace_memory=True)
+    instrumentation.start_run()
+    with instrumentation.stage("traced"):
+        pass
+    record, = instrumentation.run_records()
+    assert record["memory_traced"] is True and "peak_mb" in record
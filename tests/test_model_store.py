@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.model_store import PINNED_FILE, cached_forecast, lookup_forecast, pretrain_forecasts
+
+
+def _panel(countries=17, years=12, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "country": np.repeat([f"Country {c:02d}" for c in range(countries)], years),
+        "date": np.tile(np.arange(2010, 2010 + years), countries),
+        "gdp": rng.uniform(1, 100, countries * years)
+    })
+
+
+def _entries(store_dir):
+    return sorted(name for name in os.listdir(store_dir) if name.endswith(".pkl"))
+
+
+def test_on_demand_misses_do_not_evict_pretrained_series(tmp_path):
+    panel = _panel()
+    assert pretrain_forecasts(panel, ["gdp"], model="linear", n_jobs=1, store_dir=tmp_path, max_entries=5) == 17
+    pretrained = _entries(tmp_path)
+    assert len(pretrained) == 17
+
+    # Series that were not pretrained: cached on demand, capped at max_entries
+    extra = _panel(countries=8, seed=1).assign(country=lambda df: "New " + df["country"])
+    for country in extra["country"].unique():
+        cached_forecast(extra, country, "gdp", model="linear", store_dir=tmp_path, max_entries=5)
+
+    remaining = _entries(tmp_path)
+    assert set(pretrained) <= set(remaining)
+    assert len(remaining) == 17 + 5
+
+
+def test_pretraining_again_unpins_outdated_series(tmp_path):
+    pretrain_forecasts(_panel(countries=6), ["gdp"], model="linear", n_jobs=1, store_dir=tmp_path, max_entries=2)
+    old = set(_entries(tmp_path))
+
+    # New data for every series: the old entries lose their pin and are evicted down to the cap
+    assert pretrain_forecasts(_panel(countries=6, seed=2), ["gdp"], model="linear", n_jobs=1,
+                              store_dir=tmp_path, max_entries=2) == 6
+    remaining = set(_entries(tmp_path))
+    assert len(remaining) == 6 + 2
+    assert len(remaining & old) == 2
+    assert os.path.exists(tmp_path / PINNED_FILE)
+
+
+def test_eviction_leaves_in_flight_temporary_files_alone(tmp_path):
+    panel = _panel(countries=4)
+    in_flight = tmp_path / "abc.pkl.123.tmp"
+    tmp_path.mkdir(exist_ok=True)
+    in_flight.write_bytes(b"partial")
+    for country in panel["country"].unique():
+        cached_forecast(panel, country, "gdp", model="linear", store_dir=tmp_path, max_entries=1)
+
+    assert in_flight.exists()
+    assert len(_entries(tmp_path)) == 1
+
+
+def test_lookup_only_reads_the_store(tmp_path):
+    panel = _panel(countries=2)
+    assert lookup_forecast(panel, "Country 00", "gdp", 10, model="linear", store_dir=tmp_path) is None
+    assert _entries(tmp_path) == []
+
+    fitted = cached_forecast(panel, "Country 00", "gdp", 10, model="linear", store_dir=tmp_path)
+    pd.testing.assert_frame_equal(lookup_forecast(panel, "Country 00", "gdp", 10, model="linear", store_dir=tmp_path),
+                                  fitted)
+    # Longer horizons than stored are a miss, and other data is a different entry
+    assert lookup_forecast(panel, "Country 00", "gdp", 40, model="linear", store_dir=tmp_path) is None
+    assert lookup_forecast(panel.assign(gdp=panel["gdp"] + 1), "Country 00", "gdp", 10, model="linear",
+                           store_dir=tmp_path) is None
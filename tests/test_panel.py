@@ -0,0 +1,81 @@
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.preprocessing import PANEL_KEYS, aggregate_historical, aggregate_panel, build_panel
+
+
+def _frame(name, rows):
+    return pd.DataFrame(rows, columns=["country", "country_code", "date", name])
+
+
+@pytest.fixture
+def frames():
+    # Indicators with non-overlapping (country, year) rows, gaps and a country only one of them has
+    return [
+        _frame("gdp", [
+            ("Aa", "AAA", 2000, 1.0), ("Aa", "AAA", 2001, 2.0), ("Aa", "AAA", 2002, 3.0),
+            ("Bb", "BBB", 2000, 4.0), ("Bb", "BBB", 2003, 8.0),
+        ]),
+        _frame("gini", [
+            ("Aa", "AAA", 2001, 30.0), ("Aa", "AAA", 2003, np.nan),
+            ("Bb", "BBB", 2001, 40.0), ("Bb", "BBB", 2002, 42.0),
+            ("Cc", "CCC", 1999, 25.0),
+        ]),
+        _frame("inflation", [
+            ("Cc", "CCC", 2000, 1.5), ("Bb", "BBB", 2003, np.nan), ("Aa", "AAA", 2000, 2.5),
+        ]),
+    ]
+
+
+def _reduce_merge(frames):
+    """
+    The previous panel builder: chained pairwise outer merges.
+    """
+    return reduce(lambda l, r: pd.merge(l, r, on=PANEL_KEYS, how="outer"), frames)
+
+
+def _sorted(df, keys):
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+def test_build_panel_matches_chained_outer_merges(frames):
+    expected = _sorted(_reduce_merge(frames), PANEL_KEYS)
+    pd.testing.assert_frame_equal(build_panel(frames), expected)
+
+
+def test_mean_aggregation_matches_previous_groupby_mean(frames):
+    expected = _reduce_merge(frames).groupby(["country", "country_code"], as_index=False).mean(numeric_only=True)
+
+    pd.testing.assert_frame_equal(aggregate_panel(build_panel(frames)), expected)
+    pd.testing.assert_frame_equal(aggregate_historical(frames), expected)
+
+
+def test_latest_takes_each_indicators_last_observed_value(frames):
+    merged = _reduce_merge(frames)
+    result = aggregate_panel(build_panel(frames), how="latest").set_index("country")
+
+    for (country, _), rows in merged.groupby(["country", "country_code"]):
+        rows = rows.sort_values("date")
+        for indicator in ["gdp", "gini", "inflation"]:
+            observed = rows[indicator].dropna()
+            expected = observed.iloc[-1] if len(observed) else np.nan
+            assert result.loc[country, indicator] == pytest.approx(expected, nan_ok=True)
+
+
+@pytest.mark.parametrize("n_years", [1, 2, 5])
+def test_recent_averages_each_countrys_last_years(frames, n_years):
+    merged = _reduce_merge(frames)
+    last_year = merged.groupby("country")["date"].transform("max")
+    expected = merged[merged["date"] > last_year - n_years]\
+        .groupby(["country", "country_code"], as_index=False).mean(numeric_only=True)
+
+    result = aggregate_panel(build_panel(frames), how="recent", n_years=n_years)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_unknown_aggregation_is_rejected(frames):
+    with pytest.raises(ValueError):
+        aggregate_panel(build_panel(frames), how="median")
@@ -0,0 +1,108 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import pipeline
+from src.pipeline import run_pipeline
+
+INDICATORS = ["gdp_per_capita", "inflation", "unemployment", "gini_index", "education_spending_gdp"]
+WEIGHTS = {"gdp": 0.3, "gini": 0.2, "education": 0.15, "maternity": 0.1,
+           "employment": 0.05, "stability": 0.05, "hdi": 0.15}
+
+
+def test_stage_key_changes_with_the_stage_schema_version(monkeypatch):
+    before = pipeline.stage_key("clean", "abc", "gdp", "mean_median")
+    assert pipeline.stage_key("clean", "abc", "gdp", "mean_median") == before
+
+    monkeypatch.setitem(pipeline.STAGE_VERSIONS, "clean", pipeline.STAGE_VERSIONS["clean"] + 1)
+    assert pipeline.stage_key("clean", "abc", "gdp", "mean_median") != before
+
+
+def test_every_cached_stage_has_a_schema_version():
+    assert set(pipeline.STAGE_VERSIONS) == {"clean", "panel", "hdi", "aggregate", "normalize", "score"}
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """
+    Raw indicator CSVs, an HDI file and the context frame for a few countries.
+    """
+    rng = np.random.default_rng(0)
+    raw_path = tmp_path / "raw"
+    raw_path.mkdir()
+    countries = [(f"Country {i}", f"C{i:02d}") for i in range(8)]
+    years = np.arange(2015, 2024)
+    keys = pd.DataFrame([(name, code, year) for name, code in countries for year in years],
+                        columns=["country", "country_code", "date"])
+    for indicator in INDICATORS:
+        keys.assign(value=rng.uniform(1, 100, len(keys))).to_csv(raw_path / f"{indicator}_worldbank.csv", index=False)
+
+    hdi_path = tmp_path / "hdi.csv"
+    pd.DataFrame({"Entity": keys["country"], "Code": keys["country_code"], "Year": keys["date"],
+                  "Human Development Index": rng.uniform(0.4, 0.95, len(keys))}).to_csv(hdi_path, index=False)
+    context = pd.DataFrame({"country": [name for name, _ in countries], "maternity_score": np.arange(8) % 5 + 1})
+    return {"raw_path": str(raw_path), "hdi_path": str(hdi_path), "context_df": context,
+            "cache_dir": str(tmp_path / "cache"), "store_dir": str(tmp_path / "panel")}
+
+
+def _run(workspace, capsys, weights=WEIGHTS):
+    """
+    Runs the pipeline and returns the stages it rebuilt and those served from cache.
+    """
+    capsys.readouterr()
+    result = run_pipeline(INDICATORS, workspace["context_df"], weights, raw_path=workspace["raw_path"],
+                          hdi_path=workspace["hdi_path"], n_jobs=1, cache_dir=workspace["cache_dir"],
+                          store_dir=workspace["store_dir"])
+    output = capsys.readouterr().out
+    rebuilt = set(re.findall(r"(\S+): rebuilt", output))
+    hits = set(re.findall(r"(\S+): unchanged", output))
+    return result, rebuilt, hits
+
+
+def test_first_run_rebuilds_every_stage_and_second_run_hits_the_cache(workspace, capsys):
+    _, rebuilt, _ = _run(workspace, capsys)
+    assert rebuilt == {*(f"clean[{ind}]" for ind in INDICATORS), "panel", "hdi", "aggregate", "normalize", "score"}
+
+    _, rebuilt, hits = _run(workspace, capsys)
+    assert rebuilt == set()
+    assert hits == {"panel", "hdi", "aggregate", "normalize", "score"}
+
+
+def test_new_weights_only_rerun_scoring(workspace, capsys):
+    first, _, _ = _run(workspace, capsys)
+    result, rebuilt, hits = _run(workspace, capsys, weights={**WEIGHTS, "gdp": 0.9})
+
+    assert rebuilt == {"score"}
+    assert hits == {"panel", "hdi", "aggregate", "normalize"}
+    pd.testing.assert_frame_equal(result["matrix"], first["matrix"])
+    assert not np.allclose(result["scored"]["relocation_score"], first["scored"]["relocation_score"])
+
+
+def test_edited_raw_csv_rebuilds_its_clean_entry_and_downstream_only(workspace, capsys):
+    _run(workspace, capsys)
+    path = os.path.join(workspace["raw_path"], "inflation_worldbank.csv")
+    df = pd.read_csv(path)
+    df.loc[0, "value"] = 999.0
+    df.to_csv(path, index=False)
+
+    _, rebuilt, hits = _run(workspace, capsys)
+    assert rebuilt == {"clean[inflation]", "panel", "hdi", "aggregate", "normalize", "score"}
+    # The other indicators' cleaned frames come from the cache
+    assert {f"clean[{ind}]" for ind in INDICATORS if ind != "inflation"} <= hits
+
+
+def test_stage_eviction_leaves_in_flight_temporary_files_alone(tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, "KEEP_PER_STAGE", 1)
+    stage_dir = tmp_path / "score"
+    stage_dir.mkdir()
+    in_flight = stage_dir / "other.pkl.4242.tmp"
+    in_flight.write_bytes(b"partial")
+
+    pipeline._store("score", "a", 1, str(tmp_path))
+    pipeline._store("score", "b", 2, str(tmp_path))
+
+    assert in_flight.exists()
+    assert sorted(os.listdir(stage_dir)) == ["b.pkl", "other.pkl.4242.tmp"]
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from src.predictive import bootstrap_linear_intervals, forecast_intervals_batch, forecast_linear_batch, predict_linear_trend
+
+
+def _series_cube(countries=6, years=15, indicators=3, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(years)
+    cube = rng.normal(size=(countries, 1, indicators)) + 0.2 * t[None, :, None] \
+        + rng.normal(0, 0.5, (countries, years, indicators))
+    cube[0, :4, 1] = np.nan
+    cube[1, :, 2] = np.nan
+    return cube, 2003 + t
+
+
+def test_replicate_blocks_do_not_change_the_bands_shape_or_nesting():
+    cube, years = _series_cube()
+    lower, upper = bootstrap_linear_intervals(cube, years, years_ahead=5, n_boot=120, block=25)
+
+    assert lower.shape == upper.shape == (6, 3, 5)
+    assert np.isnan(lower[1, 2]).all()  # no data, no band
+    observed = ~np.isnan(lower)
+    assert (lower[observed] <= upper[observed]).all()
+
+
+def test_bands_do_not_depend_on_replicate_blocks_or_neighbours():
+    cube, years = _series_cube()
+    lower, upper = bootstrap_linear_intervals(cube, years, years_ahead=5, n_boot=120, block=25)
+
+    one_block = bootstrap_linear_intervals(cube, years, years_ahead=5, n_boot=120, block=120)
+    np.testing.assert_array_equal(lower, one_block[0])
+    np.testing.assert_array_equal(upper, one_block[1])
+    # A series resampled on its own, at its position in the cube
+    alone = bootstrap_linear_intervals(cube[2:3, :, 1:2], years, years_ahead=5, n_boot=120, block=25, origin=(2, 1))
+    np.testing.assert_array_equal(lower[2:3, 1:2], alone[0])
+    np.testing.assert_array_equal(upper[2:3, 1:2], alone[1])
+
+
+def test_batched_bands_do_not_depend_on_workers_or_tiles():
+    cube, years = _series_cube(countries=10, indicators=4)
+    indicators = [f"ind_{k}" for k in range(4)]
+    panel = pd.DataFrame({
+        "country": np.repeat([f"Country {c}" for c in range(10)], len(years)),
+        "date": np.tile(years, 10),
+        **{name: cube[:, :, k].ravel() for k, name in enumerate(indicators)}
+    })
+
+    serial = forecast_intervals_batch(panel, indicators, years_ahead=4, n_boot=60, n_jobs=1,
+                                      chunk_size=3, indicator_chunk_size=2)
+    for n_jobs, chunk_size, indicator_chunk_size in [(2, 3, 2), (2, 4, 3), (1, 10, 4), (3, 1, 1)]:
+        tiled = forecast_intervals_batch(panel, indicators, years_ahead=4, n_boot=60, n_jobs=n_jobs,
+                                         chunk_size=chunk_size, indicator_chunk_size=indicator_chunk_size)
+        pd.testing.assert_frame_equal(serial, tiled)
+
+    points = forecast_linear_batch(panel, indicators, years_ahead=4)
+    pd.testing.assert_frame_equal(serial[["country", "indicator", "year"]], points[["country", "indicator", "year"]])
+
+
+def test_linear_trend_bands_are_opt_in():
+    cube, years = _series_cube()
+    panel = pd.DataFrame({"country": "Country 3", "date": years, "gdp": cube[3, :, 0]})
+
+    points, _ = predict_linear_trend(panel, "Country 3", "gdp", years_ahead=5)
+    assert list(points.columns) == ["year", "prediction"]
+
+    banded, _ = predict_linear_trend(panel, "Country 3", "gdp", years_ahead=5, intervals=True)
+    pd.testing.assert_frame_equal(banded[["year", "prediction"]], points)
+    assert (banded["lower"] <= banded["prediction"]).all() and (banded["prediction"] <= banded["upper"]).all()
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.preprocessing import (
+    IMPUTATION_STRATEGIES, build_panel, load_and_clean_indicator, load_and_clean_indicators
+)
+
+
+def _write_indicator(raw_path, name, rows):
+    pd.DataFrame(rows, columns=["country", "country_code", "date", "value"]).to_csv(
+        os.path.join(raw_path, f"{name}_worldbank.csv"), index=False
+    )
+
+
+@pytest.fixture
+def uneven_raw(tmp_path):
+    """
+    Two indicators whose CSVs cover different (country, year) rows: `b` has no
+    rows at all for Cc, no 2002 row for Aa, and a single, missing value for Bb.
+    """
+    _write_indicator(tmp_path, "a", [
+        ("Aa", "AAA", 2000, 1.0), ("Aa", "AAA", 2001, 2.0), ("Aa", "AAA", 2002, 3.0),
+        ("Bb", "BBB", 2000, 4.0), ("Bb", "BBB", 2001, np.nan), ("Bb", "BBB", 2002, 6.0),
+        ("Cc", "CCC", 2000, 7.0), ("Cc", "CCC", 2002, np.nan),
+    ])
+    _write_indicator(tmp_path, "b", [
+        ("Aa", "AAA", 2000, 10.0), ("Aa", "AAA", 2001, np.nan),
+        ("Bb", "BBB", 2002, np.nan),
+    ])
+    return tmp_path
+
+
+def _per_indicator(raw_path, indicators, strategy):
+    return build_panel([
+        load_and_clean_indicator(os.path.join(raw_path, f"{ind}_worldbank.csv"), ind, strategy=strategy)
+        for ind in indicators
+    ])
+
+
+@pytest.mark.parametrize("strategy", IMPUTATION_STRATEGIES)
+def test_wide_cleaning_matches_per_indicator_path_on_uneven_rows(uneven_raw, strategy):
+    expected = _per_indicator(uneven_raw, ["a", "b"], strategy)
+    wide = load_and_clean_indicators(["a", "b"], raw_path=uneven_raw, strategy=strategy)
+    result = wide.sort_values(["country", "date"]).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(result, expected, check_categorical=False)
+
+
+def test_missing_rows_stay_out_of_the_yearly_median(uneven_raw):
+    wide = load_and_clean_indicators(["a", "b"], raw_path=uneven_raw).set_index(["country_code", "date"])
+
+    # Aa's 2002 row is absent from b's CSV: it is neither filled nor used for Bb's 2002 fallback
+    assert np.isnan(wide.loc[("AAA", 2002), "b"])
+    assert np.isnan(wide.loc[("BBB", 2002), "b"])
+    assert wide.xs("CCC")["b"].isna().all()
@@ -0,0 +1,73 @@
+import os
+import json
+import zipfile
+
+import pandas as pd
+import pytest
+
+from scripts.benchmark import generate_wdi_archive
+from src.data_fetching import FETCH_CACHE_FILE, fetch_cache_key
+from src.wdi_bulk import import_wdi_bulk, iter_wdi_chunks
+
+
+@pytest.fixture(scope="module")
+def archive(tmp_path_factory):
+    # 12 countries × 10 years (2014–2023) × 5 indicators, wide WDI layout
+    return generate_wdi_archive(str(tmp_path_factory.mktemp("wdi")), countries=12, years=10, indicators=5)
+
+
+def _archive_long(path):
+    with zipfile.ZipFile(path) as zf, zf.open("WDICSV.csv") as stream:
+        wide = pd.read_csv(stream)
+    return wide.melt(id_vars=["Country Name", "Country Code", "Indicator Name", "Indicator Code"],
+                     var_name="date", value_name="value").astype({"date": int})
+
+
+def test_chunks_keep_only_the_requested_indicators_countries_and_years(archive):
+    path, codes, countries = archive
+    chunks = list(iter_wdi_chunks(path, ["SYN.0001"], countries[::4], 2016, 2018, chunk_rows=4))
+
+    rows = pd.concat(chunks)
+    assert len(chunks) > 1
+    assert set(rows["indicator"]) == {"SYN.0001"}
+    assert set(rows["country_code"]) == set(countries[::4])
+    assert sorted(rows["date"].astype(int).unique()) == [2016, 2017, 2018]
+
+
+def test_import_writes_filtered_csvs_and_fetch_cache(archive, tmp_path, capsys):
+    path, codes, countries = archive
+    wanted = {"SYN.0000": "indicator_0000", "SYN.0003": "indicator_0003", "SYN.9999": "missing"}
+    selected = countries[2:7]
+
+    written = import_wdi_bulk(path, indicators=wanted, countries=selected, start_year=2015, end_year=2020,
+                              output_dir=str(tmp_path), chunk_rows=5)
+
+    assert written == {"indicator_0000": 5 * 6, "indicator_0003": 5 * 6}
+    assert "No data in archive for SYN.9999" in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / "missing_worldbank.csv")
+
+    source = _archive_long(path)
+    for code, name in [("SYN.0000", "indicator_0000"), ("SYN.0003", "indicator_0003")]:
+        df = pd.read_csv(tmp_path / f"{name}_worldbank.csv")
+        assert list(df.columns) == ["country", "country_code", "date", "value"]
+        # Ordered like the requested countries, latest year first
+        assert df["country_code"].drop_duplicates().tolist() == selected
+        assert df.groupby("country_code")["date"].apply(list).map(lambda d: d == list(range(2020, 2014, -1))).all()
+
+        expected = source[(source["Indicator Code"] == code) & source["Country Code"].isin(selected)
+                          & source["date"].between(2015, 2020)]
+        merged = df.merge(expected, left_on=["country_code", "date"], right_on=["Country Code", "date"])
+        assert len(merged) == len(df)
+        pd.testing.assert_series_equal(merged["value_x"], merged["value_y"], check_names=False)
+
+    with open(tmp_path / FETCH_CACHE_FILE, encoding="utf-8") as f:
+        cache = json.load(f)
+    assert set(cache) == {fetch_cache_key(code, selected, 2015, 2020) for code in ("SYN.0000", "SYN.0003")}
+    entry = cache[fetch_cache_key("SYN.0000", selected, 2015, 2020)]
+    assert entry["years"] == list(range(2015, 2021))
+    assert entry["countries"] == sorted(selected)
+    assert entry["lastupdated"] is None
+
+    df = pd.read_csv(tmp_path / "indicator_0000_worldbank.csv")
+    counts = df.dropna(subset=["value"]).groupby("date")["country_code"].nunique()
+    assert entry["complete_years"] == sorted(int(y) for y in counts[counts == len(selected)].index)